@@ -0,0 +1,21 @@
+from enum import Enum
+from typing import NamedTuple, Tuple
+
+class ActionType(Enum):
+    FORWARD = "Forward"
+    GRAB = "Grab"
+    CLIMB = "Climb"
+    RETURN = "Return"  # Step back after bumping into a wall
+
+
+class Action(NamedTuple):
+    """An action executed by the agent, with the position and orientation it
+    left the agent in and the time step. Rendered as the classic
+    `Executed(Forward| (x, y)| EAST| t)` sentence only when printed."""
+    kind: ActionType
+    position: Tuple[int, int]
+    orientation: str
+    t: int
+
+    def __str__(self) -> str:
+        return f"Executed({self.kind.value}| {self.position}| {self.orientation}| {self.t})"
@@ -1,118 +1,115 @@
+import time
+from action import Action, ActionType
 from knowledgebase import KnowledgeBase
+from percept import Percept
+from planner import Planner
+from risk import RiskEstimator
+from stats import STATS
 
 class LogicAgent:
-    def __init__(self):
+    def __init__(self, verbose=True, grid_size=4, seed=0):
         self.KB = KnowledgeBase()
+        self.verbose = verbose  # Print the reasoning of every move
+        self.grid_size = grid_size
         self.DELTAS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
         
-    def safe_neighbors(self, position):
-        neighbours = self.get_neighbors(position)        
-        safe_neighbors = set()
-        
-        for neighbor in neighbours:
-            x, y = neighbor
-            
-            if x < 0 or y < 0:
-                continue
-            
-            # Current Neighbor
-            loc = f"{x}_{y}"
-            
-            # Add current location spot to the safe_spots
-            is_loc = self.KB.ask(f"L{loc}")
-            if is_loc:
-                safe_neighbors.add(neighbor)
-            
-            # print(f"Safe Neighbors: {safe_neighbors} after checking for location")
-            # isnt_pit = self.KB.ask(Expr.create_expression(f"~P{loc}"))
-            # isnt_wumpus = self.KB.ask(Expr.create_expression(f"~W{loc}"))
-            isnt_pit = not self.KB.ask(f"P{loc}")
-            isnt_wumpus = not self.KB.ask(f"W{loc}")
-            if isnt_pit and isnt_wumpus:
-                safe_neighbors.add(neighbor)
-            
-            # print("Current KB: ", self.KB.clauses)
-            # print(f"Current neighbor: {neighbor} - {loc} - isnt_pit: {isnt_pit} - isnt_wumpus: {isnt_wumpus} is_loc: {is_loc}")
-        return safe_neighbors                
-        
-    def not_unsafe_neighbors(self, position: tuple):
-        neighbours = self.get_neighbors(position)
-        not_unsafe_neighbors = set()
-        
-        for neighbor in neighbours:
-            x, y = neighbor
-            
-            if x < 0 or y < 0:
-                continue
-            
-            # Current Neighbor
-            loc = f"{x}_{y}"
-            
-            # is_loc = self.KB.ask(Expr.create_expression(f"L{loc}"))
-            is_loc = self.KB.ask(f"L{loc}")
-            if not is_loc:
-                not_unsafe_neighbors.add(neighbor)
-                
-            
-            # Not a pit or not a wumpus at current location
-            # print("is_wumpus: ", f"W{loc}")
-            # is_wumpus = self.KB.ask(Expr.create_expression(f"W{loc}"))
-            # is_pit = self.KB.ask(Expr.create_expression(f"P{loc}"))
-            is_wumpus = self.KB.ask(f"W{loc}")
-            is_pit = self.KB.ask(f"P{loc}")
-            if not is_wumpus and not is_pit:
-                not_unsafe_neighbors.add(neighbor)
-            
-            # print(f"Current neighbor: {neighbor} - {loc} - is_wumpus: {is_wumpus} - is_pit: {is_pit} is_loc: {is_loc}")
-
-
-        return not_unsafe_neighbors
+        # Cells told to the KB as L x_y, and the unvisited cells next to them
+        self.visited = set()
+        self.frontier = set()
         
+        # Cells proven safe and unsafe, and the route the agent is following
+        self.planner = Planner(grid_size)
+        self.unsafe = set()
+        self.plan = []
+        self.planned_safe = 0  # Sizes of the safe and unsafe sets when the plan was made
+        self.planned_unsafe = 0
+        self.risk = RiskEstimator(grid_size, seed=seed)  # Seeds the sampling of large groups
         
     def get_neighbors(self, position):
-        return [(position[0] + dx, position[1] + dy) for dx, dy in self.DELTAS if 0 <= position[0] + dx and 0 <= position[1] + dy]
+        """Returns the cells of the grid next to a position."""
+        x, y = position
+        return [(x + dx, y + dy) for dx, dy in self.DELTAS if self.inside((x + dx, y + dy))]
+    
+    def inside(self, cell):
+        return 0 <= cell[0] < self.grid_size and 0 <= cell[1] < self.grid_size
+    
+    def mark_visited(self, position):
+        """Records a cell whose L x_y was told to the KB."""
+        self.visited.add(position)
+        self.frontier.discard(position)
+        for neighbor in self.get_neighbors(position):
+            if neighbor not in self.visited:
+                self.frontier.add(neighbor)
     
     def unvisited(self, position):
-        neighbours = self.get_neighbors(position)
-        unvisited = set()
-        for neighbor in neighbours:
-            # if we haven't added the neighbor to the unvisited set, add it
-            
-            if f"L{neighbor[0]}_{neighbor[1]}" not in [str(clause) for clause in self.KB.clauses]:
-                unvisited.add(neighbor)
-        
-        return unvisited
+        return {neighbor for neighbor in self.get_neighbors(position) if neighbor not in self.visited}
     
-    def get_next_cell(self, position):
-        print(f"Current Position: {position}")  
-        unvisited_cells = self.unvisited(position)
-        print(f"Unvisited Cells: {unvisited_cells}")
-        
-        safe_cells = self.safe_neighbors(position)
-        print(f"Safe Cells: {safe_cells}")
-        
-        safe_cells = safe_cells.intersection(unvisited_cells)
-        
-        print(f"Safe Unvisited Cells: {safe_cells}")
-        
+    def update_safe_cells(self, cells):
+        """Asks the KB about the cells whose safety is not settled yet, and
+        records the ones proven safe (no pit and no wumpus) or unsafe."""
+        cells = [cell for cell in cells if cell not in self.planner.safe and cell not in self.unsafe]
+        if not cells:
+            return
+        queries = [f"{symbol}{x}_{y}" for x, y in cells for symbol in "PW"]
+        answers = self.KB.ask_many(queries)
+        safe = []
+        for i, cell in enumerate(cells):
+            is_pit, is_wumpus = answers[2 * i], answers[2 * i + 1]
+            if is_pit is False and is_wumpus is False:
+                safe.append(cell)
+            elif is_pit or is_wumpus:
+                self.unsafe.add(cell)
+        self.planner.add_safe(safe)
+    
+    def plan_route(self, position):
+        """Returns the route to the closest unvisited cell that is proven safe. If
+        there is none, the route to the one least likely to hold a pit or the
+        wumpus."""
+        safe_cells = self.frontier & self.planner.safe
+        if not safe_cells:
+            # Facts learnt since a frontier cell was first asked about may settle it
+            self.update_safe_cells(self.frontier)
+            safe_cells = self.frontier & self.planner.safe
+        if self.verbose:
+            print(f"Safe Unvisited Cells: {safe_cells}")
         if safe_cells:
-            next_cell = min(safe_cells)
-        else:
-            print("No safe cells, checking for not unsafe cells")
-            not_unsafe_cells = self.not_unsafe_neighbors(position)
-            print(f"Not unsafe Cells: {not_unsafe_cells}")
-            not_unsafe_cells = not_unsafe_cells.intersection(unvisited_cells)
-            if not_unsafe_cells:
-                next_cell = min(not_unsafe_cells)
-            else:
-                raise Exception("Nowhere left to go")
-
-        return next_cell
+            return self.planner.nearest(position, safe_cells)
+        
+        if self.verbose:
+            print("No safe cells, checking for the least risky cell")
+        # Cells off the map would get the bare prior, so they are never candidates
+        risks = self.risk.risks(self.KB, [cell for cell in self.frontier - self.unsafe if self.inside(cell)])
+        if self.verbose:
+            print(f"Risks: {risks}")
+        distance = lambda cell: abs(cell[0] - position[0]) + abs(cell[1] - position[1])
+        for cell in sorted(risks, key=lambda cell: (round(risks[cell], 9), distance(cell), cell)):
+            route = self.planner.nearest(position, [cell])
+            if route:
+                return route
+        return None
+    
+    def get_next_cell(self, position):
+        """Returns the next step of the route to explore, or None if there is
+        nowhere left to go. The route is kept until the safe or the unsafe set
+        grows, or one of its cells is proven unsafe."""
+        if self.verbose:
+            print(f"Current Position: {position}")
+        self.update_safe_cells(self.get_neighbors(position))
+        
+        if (not self.plan or self.planned_safe != len(self.planner.safe)
+                or self.planned_unsafe != len(self.unsafe) or any(cell in self.unsafe for cell in self.plan)):
+            self.plan = self.plan_route(position) or []
+            self.planned_safe = len(self.planner.safe)
+            self.planned_unsafe = len(self.unsafe)
+        if self.verbose:
+            print(f"Route: {self.plan}")
+        
+        return self.plan.pop(0) if self.plan else None
 
 class WumpusAgent(LogicAgent):
-    def __init__(self, initial_position=(0, 0)):
+    def __init__(self, initial_position=(0, 0), verbose=True, grid_size=4, seed=0):
         # Initialize the agent
-        super().__init__()
+        super().__init__(verbose, grid_size, seed)
         
         # Constants
         self.ORIENTATIONS = ['NORTH', 'EAST', 'SOUTH', 'WEST']
@@ -128,10 +125,14 @@ class WumpusAgent(LogicAgent):
         self.is_alive = True
         self.score = 0
         self.wumpus_alive = True
+        
+        # Time and queries of each turn, recorded while the stats are enabled
+        self.turns = []
+        self.turn = None  # The turn being recorded
 
 
-    def make_action_sentence(self, action):
-        return f"Executed({action}| {self.position}| {self.orientation}| {self.t})"
+    def make_action(self, kind):
+        return Action(kind, self.position, self.orientation, self.t)
     
     def make_clause(self, position, symbol):
         return f"{symbol}{position[0]}_{position[1]}"
@@ -153,7 +154,7 @@ class WumpusAgent(LogicAgent):
         
         
         # Scream
-        if 'Scream' in percept:
+        if Percept.SCREAM in percept:
             self.wumpus_alive = False
             
         # New perceptions
@@ -168,7 +169,7 @@ class WumpusAgent(LogicAgent):
         percept_sentences.append(self.make_clause(self.position, '~W'))
         
         # Breeze
-        if 'Breeze' in percept:
+        if Percept.BREEZE in percept:
             breeze = self.make_clause(self.position, 'B')
             # neighbor_clause = self.make_neighbor_clause(self.position, 'B', 'P')
         else:
@@ -178,7 +179,7 @@ class WumpusAgent(LogicAgent):
         # percept_sentences.append(neighbor_clause)
         
         # Stench
-        if 'Stench' in percept:
+        if Percept.STENCH in percept:
             stench = self.make_clause(self.position, 'S')
             # neighbor_clause = self.make_neighbor_clause(self.position, 'S', 'W')
         else:
@@ -188,60 +189,92 @@ class WumpusAgent(LogicAgent):
         # percept_sentences.append(neighbor_clause)
         
         # Glitter
-        if 'Glitter' in percept:
+        if Percept.GLITTER in percept:
             percept_sentences.append(self.make_clause(self.position, 'G'))
         
         return percept_sentences
     
+    def move(self, cell):
+        """Turns towards a neighboring cell and moves into it."""
+        dx, dy = cell[0] - self.position[0], cell[1] - self.position[1]
+        self.orientation = [k for k, v in self.MOVEMENTS.items() if v == (dx, dy)][0]
+        self.position = cell
+    
     def go_to(self, goal):
-        self.position = goal
+        """Takes one step along the shortest safe route to the goal. Returns None
+        if there is no such route."""
+        route = self.planner.path(self.position, goal)
+        if not route:
+            return None
+        self.move(route[0])
+        return self.make_action(ActionType.FORWARD)
     
     def act(self, percept):
+        if not STATS.enabled:
+            return self.choose_action(percept)
+        
+        started, queries = time.perf_counter(), self.KB.queries
+        self.turn = {"t": self.t + 1, "tell": 0.0, "plan": 0.0}
+        action = self.choose_action(percept)
+        self.turn["total"] = time.perf_counter() - started
+        self.turn["queries"] = self.KB.queries - queries
+        self.turns.append(self.turn)
+        STATS.record("agent.act", self.turn["total"])
+        self.turn = None
+        return action
+    
+    def choose_action(self, percept):
         # Update time step
         self.t += 1
         
         # If we feel a bump, return to the previous position
-        if 'Bump' in percept:
+        if Percept.BUMP in percept:
             self.KB.tell(f"L{self.position[0]}_{self.position[1]}")
             self.KB.tell(f"N{self.position[0]}_{self.position[1]}")
+            self.mark_visited(self.position)
             self.position = (self.position[0] - self.MOVEMENTS[self.orientation][0], self.position[1] - self.MOVEMENTS[self.orientation][1])
-            return self.make_action_sentence('Return')
+            return self.make_action(ActionType.RETURN)
         
         # Check if there is a Glitter 
-        if 'Glitter' in percept and not self.has_gold:
+        if Percept.GLITTER in percept and not self.has_gold:
             self.has_gold = True
             # self.KB.tell(Expr.create_expression(f"G{self.position[0]}_{self.position[1]}"))
             self.KB.tell(f"G{self.position[0]}_{self.position[1]}")
-            return self.make_action_sentence('Grab')
+            return self.make_action(ActionType.GRAB)
         
         # If we have gold we need to go back to the start
         if self.has_gold and self.position == self.initial_position:
-            return self.make_action_sentence('Climb')
+            return self.make_action(ActionType.CLIMB)
         elif self.has_gold:
-            self.go_to(self.initial_position)
-            return self.make_action_sentence('Forward')
+            return self.go_to(self.initial_position)
         
         # Get the next action
         knowledge = self.make_percept_knowledge(percept, self.t)
         
         # Update knowledge base
-        for sentence in knowledge:
-            self.KB.tell(sentence)
+        started = time.perf_counter() if self.turn is not None else 0.0
+        self.KB.tell_many(knowledge)
+        self.mark_visited(self.position)
+        self.planner.add_safe([self.position])
         
         # Ask the knowledge base for the next action
+        if self.turn is not None:
+            planning = time.perf_counter()
+            self.turn["tell"] = planning - started
         next_cell = self.get_next_cell(self.position)
+        if self.turn is not None:
+            self.turn["plan"] = time.perf_counter() - planning
         
-        # Change the orientation and move to the next cell
-        dx, dy = next_cell[0] - self.position[0], next_cell[1] - self.position[1]
-        
-        # Locate the orientation
-        new_orientation = [k for k, v in self.MOVEMENTS.items() if v == (dx, dy)][0]
-        self.orientation = new_orientation
+        # Nothing left to explore, leave the cave
+        if next_cell is None:
+            if self.position == self.initial_position:
+                return self.make_action(ActionType.CLIMB)
+            return self.go_to(self.initial_position)
         
-        # Move to the next cell
-        self.position = next_cell
+        # Change the orientation and move to the next cell
+        self.move(next_cell)
         
         # Return the action
-        return self.make_action_sentence('Forward')
+        return self.make_action(ActionType.FORWARD)
 
 
@@ -0,0 +1,187 @@
+import argparse
+import json
+import math
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional
+import numpy as np
+from environment import Environment
+from expression import Expr, parse_expression
+from knowledgebase import KnowledgeBase
+from logic import Logic
+from main import Utils
+from percept import Percept
+from rules import WumpusRules
+from runner import run_episode
+
+class Case(NamedTuple):
+    """A benchmark: `setup` builds fresh state for each run (not timed) and
+    `run` does `items` operations on it."""
+    name: str
+    setup: Callable[[], Any]
+    run: Callable[[Any], Any]
+    items: int
+    repeat: int
+
+
+def percentile(samples: List[float], q: float) -> float:
+    """Returns the nearest-rank q-th percentile (0-100) of the samples."""
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[rank]
+
+
+def measure(case: Case, memory: bool = True) -> Dict[str, float]:
+    """Runs a case `repeat` times and returns its latency percentiles (seconds
+    per run), throughput (operations per second) and, with `memory`, the peak
+    memory allocated by one run (bytes, measured in an extra run)."""
+    samples = []
+    for _ in range(case.repeat):
+        state = case.setup()
+        started = time.perf_counter()
+        case.run(state)
+        samples.append(time.perf_counter() - started)
+
+    result = {
+        "runs": len(samples),
+        "items": case.items,
+        "p50": percentile(samples, 50),
+        "p90": percentile(samples, 90),
+        "p99": percentile(samples, 99),
+        "ops_per_second": case.items * len(samples) / sum(samples),
+    }
+    if memory:
+        state = case.setup()
+        tracemalloc.start()
+        try:
+            case.run(state)
+            result["peak_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+
+def rule_sentences(grid_size: int) -> List[str]:
+    """The Wumpus world rules of a grid as sentence strings."""
+    return Utils().define_starting_clauses(Environment(grid_size, rng=np.random.default_rng(0)))
+
+
+def explored_kb(grid_size: int, seed: int = 0) -> KnowledgeBase:
+    """A KB with the rules of a seeded world and the percepts of its cells
+    that hold no hazard in the first rows, as an agent would know them."""
+    world = Environment(grid_size, (grid_size - 1, 0), rng=np.random.default_rng(seed))
+    kb = KnowledgeBase()
+    kb.tell_many(WumpusRules(grid_size).clauses())
+    percepts = []
+    for x in range(grid_size):
+        for y in range(min(grid_size, 3)):
+            if world.is_pit((x, y)) or world.is_wumpus((x, y)):
+                continue
+            percept = world.get_percept((x, y))
+            percepts += [f"L{x}_{y}", f"~P{x}_{y}", f"~W{x}_{y}",
+                         f"{'' if Percept.BREEZE in percept else '~'}B{x}_{y}",
+                         f"{'' if Percept.STENCH in percept else '~'}S{x}_{y}"]
+    kb.tell_many(percepts)
+    return kb
+
+
+def frontier_queries(grid_size: int) -> List[str]:
+    """Pit and wumpus queries for the cells just beyond the explored rows."""
+    row = min(grid_size, 3)
+    return [f"{symbol}{x}_{y}" for x in range(grid_size) for y in range(row, min(grid_size, row + 2)) for symbol in "PW"]
+
+
+def cases(sizes: List[int], episodes: int = 10) -> List[Case]:
+    """Returns the benchmark cases for the given grid sizes."""
+    logic = Logic()
+    result = []
+
+    def parse(sentences):
+        parse_expression.cache_clear()
+        for sentence in sentences:
+            Expr.create_expression(sentence)
+
+    def fresh_kb():
+        Logic.cnf._cache.clear()  # Make tell convert every sentence
+        return KnowledgeBase()
+
+    def cnf(sentences):
+        Logic.cnf._cache.clear()
+        for sentence in sentences:
+            logic.to_cnf(sentence)
+
+    small_kb = Expr.create_expression(" & ".join(f"({s})" for s in rule_sentences(2) + ["~B0_0", "~S0_0"]))
+    result.append(Case("tt_entails[2]", lambda: None, lambda _: logic.tt_entails(small_kb, Expr.create_expression("~P0_1 & ~P1_0")), 1, 50))
+
+    for size in sizes:
+        sentences = rule_sentences(size)
+        parsed = [Expr.create_expression(s) for s in sentences]
+        clauses = list(WumpusRules(size).clauses())
+        queries = frontier_queries(size)
+        repeat = max(3, 100 // size)
+        result += [
+            Case(f"parse[{size}]", lambda s=sentences: s, parse, len(sentences), repeat),
+            Case(f"to_cnf[{size}]", lambda p=parsed: p, cnf, len(parsed), repeat),
+            Case(f"tell[{size}]", fresh_kb, lambda kb, p=parsed: [kb.tell(s) for s in p], len(parsed), repeat),
+            Case(f"tell_many[{size}]", KnowledgeBase, lambda kb, c=clauses: kb.tell_many(c), len(clauses), repeat),
+            Case(f"ask[{size}]", lambda s=size: explored_kb(s), lambda kb, q=queries: [kb.ask(x) for x in q], len(queries), repeat),
+            Case(f"ask_many[{size}]", lambda s=size: explored_kb(s), lambda kb, q=queries: kb.ask_many(q), len(queries), repeat),
+            Case(f"retract[{size}]", lambda s=size: explored_kb(s),
+                 lambda kb, s=size: [kb.retract(f"L{x}_0") for x in range(s)], size, repeat),
+        ]
+        seeds = iter(range(10 ** 9))
+        result.append(Case(f"episode[{size}]", lambda s=seeds: next(s),
+                           lambda seed, s=size: run_episode(seed, grid_size=s, max_steps=4 * s * s), 1, episodes))
+    return result
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], threshold: float) -> List[str]:
+    """Returns a message for every case whose median latency or peak memory
+    grew by more than `threshold` (a fraction) over the baseline."""
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get(name)
+        if before is None:
+            continue
+        for metric in ("p50", "peak_bytes"):
+            if metric in result and metric in before and result[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {before[metric]:.4g} -> {result[metric]:.4g}")
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the reasoning stack and full episodes.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[4, 8, 16, 32])
+    parser.add_argument("--episodes", type=int, default=10, help="episodes per grid size")
+    parser.add_argument("--filter", default="", help="only run cases whose name contains this")
+    parser.add_argument("--no-memory", action="store_true", help="skip the memory measurements")
+    parser.add_argument("--save", help="save the results as a baseline JSON file")
+    parser.add_argument("--compare", help="compare against a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown before flagging")
+    args = parser.parse_args(argv)
+
+    results = {}
+    print(f"{'case':<18}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'ops/s':>12}{'peak KiB':>10}")
+    for case in cases(args.sizes, args.episodes):
+        if args.filter not in case.name:
+            continue
+        result = results[case.name] = measure(case, not args.no_memory)
+        peak = f"{result['peak_bytes'] / 1024:.0f}" if "peak_bytes" in result else "-"
+        print(f"{case.name:<18}{result['p50'] * 1e3:>10.3f}{result['p90'] * 1e3:>10.3f}"
+              f"{result['p99'] * 1e3:>10.3f}{result['ops_per_second']:>12.1f}{peak:>10}")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump(results, file, indent=2)
+    if args.compare:
+        with open(args.compare) as file:
+            regressions = compare(results, json.load(file), args.threshold)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
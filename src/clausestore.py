@@ -0,0 +1,388 @@
+from array import array
+from typing import AbstractSet, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple, Union
+from expression import Expr
+from logic import Logic
+
+class SymbolTable:
+    """Interns proposition symbols to positive integer ids (starting at 1).
+
+    Symbols restored from a snapshot are kept as names until they are first
+    looked up, so restoring does not build an Expr per symbol."""
+
+    def __init__(self):
+        self.ids: Dict[Expr, int] = {}
+        self.symbols: List[Union[Expr, str, None]] = [None]  # Names of restored symbols not looked up yet
+        self._restored: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.symbols) - 1
+
+    def intern(self, symbol: "Expr") -> int:
+        """Returns the id of the symbol, assigning a new one if needed."""
+        var = self.get(symbol)
+        if var is None:
+            var = len(self.symbols)
+            self.ids[symbol] = var
+            self.symbols.append(symbol)
+        return var
+
+    def get(self, symbol: "Expr") -> Optional[int]:
+        """Returns the id of the symbol, or None if it was never interned."""
+        var = self.ids.get(symbol)
+        if var is None and self._restored and not symbol.args:
+            var = self._restored.pop(symbol.op, None)
+            if var is not None:
+                self.ids[symbol] = var
+                self.symbols[var] = symbol
+        return var
+
+    def symbol(self, var: int) -> "Expr":
+        """Returns the symbol with the given id."""
+        symbol = self.symbols[var]
+        if isinstance(symbol, str):
+            symbol = Expr(symbol)
+            self.get(symbol)
+        return symbol
+
+    def names(self) -> List[str]:
+        """Returns the name of every id ("" for ids of no symbol)."""
+        return ["" if symbol is None else str(symbol) for symbol in self.symbols[1:]]
+
+    def restore(self, names: List[str]) -> None:
+        """Fills an empty table with symbols given by name ("" for ids of no
+        symbol), in id order."""
+        assert len(self.symbols) == 1, "restore needs an empty table"
+        self.symbols.extend(name or None for name in names)
+        self._restored = {name: var for var, name in enumerate(names, 1) if name}
+
+
+class OccurrenceIndex(dict):
+    """The sets of clauses each literal occurs in, backed by a packed index of
+    a snapshot: the clause ids of literal `lit` are
+    `cids[offsets[lit + shift]:offsets[lit + shift + 1]]`. A literal's set is
+    built the first time it is read."""
+
+    def __init__(self, offsets: Sequence[int], cids: Sequence[int]):
+        super().__init__()
+        self.offsets = offsets
+        self.cids = cids
+        self.shift = (len(offsets) - 2) // 2
+
+    def _load(self, lit: int) -> Optional[Set[int]]:
+        index = lit + self.shift
+        if not 0 <= index < len(self.offsets) - 1:
+            return None
+        occurrence = set(self.cids[self.offsets[index]:self.offsets[index + 1]])
+        dict.__setitem__(self, lit, occurrence)
+        return occurrence
+
+    def get(self, lit: int, default=None):
+        occurrence = dict.get(self, lit)
+        if occurrence is None:
+            occurrence = self._load(lit)
+        return default if occurrence is None else occurrence
+
+    def __getitem__(self, lit: int) -> Set[int]:
+        occurrence = self.get(lit)
+        if occurrence is None:
+            raise KeyError(lit)
+        return occurrence
+
+    def setdefault(self, lit: int, default=None):
+        occurrence = self.get(lit)
+        if occurrence is None:
+            dict.__setitem__(self, lit, default)
+            return default
+        return occurrence
+
+
+class PackedClauses(Sequence):
+    """The clauses of a snapshot, backed by its packed arrays: clause `cid` is
+    `literals[offsets[cid]:offsets[cid + 1]]`, sliced when it is read."""
+
+    def __init__(self, offsets: Sequence[int], literals: Sequence[int]):
+        self.offsets = offsets
+        self.literals = literals
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, cid: int) -> Sequence[int]:
+        return self.literals[self.offsets[cid]:self.offsets[cid + 1]]
+
+
+class CopyOnWriteList(Sequence):
+    """A list over a read-only sequence, e.g. a view of a memory-mapped
+    snapshot. Entries that are assigned or appended are kept apart, so the
+    sequence itself is never copied."""
+
+    def __init__(self, base: Sequence):
+        self.base = base
+        self.size = len(base)
+        self.changed: Dict[int, object] = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __getitem__(self, index: int):
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        if index in self.changed:
+            return self.changed[index]
+        return self.base[index]
+
+    def __setitem__(self, index: int, value) -> None:
+        if index < 0:
+            index += self.size
+        if not 0 <= index < self.size:
+            raise IndexError(index)
+        self.changed[index] = value
+
+    def __iter__(self) -> Iterator:
+        changed, base = self.changed, self.base
+        for index in range(self.size):
+            yield changed[index] if index in changed else base[index]
+
+    def append(self, value) -> None:
+        self.changed[self.size] = value
+        self.size += 1
+
+
+class ClauseStore:
+    """A clause database. Each clause is a sorted array of integer literals
+    (a symbol id, negated when the symbol is negated). Duplicate clauses are
+    stored once with a reference count, so a clause stays until it has been
+    removed as many times as it was added, and every literal keeps the set of
+    clauses it occurs in."""
+
+    def __init__(self):
+        self.symbols = SymbolTable()
+        self.logic = Logic()
+        self.occurrences: Dict[int, Set[int]] = {}
+        self._clauses: Union[List[Optional[array]], CopyOnWriteList] = []
+        self._counts: Union[List[int], CopyOnWriteList] = []
+        self._lookup: Optional[Dict[bytes, int]] = {}  # Built on first use after a restore
+        self._free: List[int] = []
+
+    def __len__(self) -> int:
+        return len(self._clauses) - len(self._free)
+
+    def __iter__(self) -> Iterator[array]:
+        return (clause for clause in self._clauses if clause is not None)
+
+    def __contains__(self, literals: array) -> bool:
+        return literals.tobytes() in self.lookup()
+
+    def lookup(self) -> Dict[bytes, int]:
+        """Returns the ids of the stored clauses by their literals' bytes."""
+        if self._lookup is None:
+            self._lookup = {literals.tobytes(): cid for cid, literals in self.items()}
+        return self._lookup
+
+    def items(self) -> Iterator[Tuple[int, array]]:
+        """Iterates over (id, literals) pairs of the stored clauses."""
+        return ((cid, clause) for cid, clause in enumerate(self._clauses) if clause is not None)
+
+    def clause(self, cid: int) -> array:
+        """Returns the literals of the clause with the given id."""
+        return self._clauses[cid]
+
+    def count(self, literals: array) -> int:
+        """Returns how many times a clause was added and not removed."""
+        cid = self.lookup().get(literals.tobytes())
+        return 0 if cid is None else self._counts[cid]
+
+    def encode(self, clause: "Expr", intern: bool = True, scratch: Optional[Dict["Expr", int]] = None) -> Optional[array]:
+        """Converts a CNF clause into a sorted literal array. Returns None if the
+        clause is always true, or if `intern` is False and it mentions a symbol
+        that is not in the store. With a `scratch` dict nothing is interned:
+        symbols that are not in the store get temporary ids past the table's,
+        recorded in the dict (e.g. for the duration of a query)."""
+        return self.encode_literals(self.logic.disjuncts(clause), intern, scratch)
+
+    def encode_literals(self, disjuncts: Iterable["Expr"], intern: bool = True,
+                        scratch: Optional[Dict["Expr", int]] = None) -> Optional[array]:
+        """Like `encode`, for a clause given as its literals (symbols or negated
+        symbols)."""
+        literals = set()
+        for literal in disjuncts:
+            negated = literal.op == "~"
+            symbol = literal.args[0] if negated else literal
+            if symbol == self.logic.TRUE or symbol == self.logic.FALSE:
+                if negated == (symbol == self.logic.TRUE):
+                    continue
+                return None
+            if scratch is not None:
+                var = self.symbols.get(symbol) or scratch.get(symbol)
+                if var is None:
+                    var = scratch[symbol] = len(self.symbols) + len(scratch) + 1
+            else:
+                var = self.symbols.intern(symbol) if intern else self.symbols.get(symbol)
+            if var is None:
+                return None
+            lit = -var if negated else var
+            if -lit in literals:
+                return None
+            literals.add(lit)
+        return array("i", sorted(literals))
+
+    def decode(self, literals: array, scratch: Optional[Dict["Expr", int]] = None) -> "Expr":
+        """Converts a literal array back into a clause expression, given the
+        scratch dict of any temporary ids it contains."""
+        temporary = {var: symbol for symbol, var in scratch.items()} if scratch else {}
+
+        def symbol(var: int) -> "Expr":
+            return temporary[var] if var in temporary else self.symbols.symbol(var)
+
+        disjuncts = [symbol(lit) if lit > 0 else ~symbol(-lit) for lit in literals]
+        return self.logic.associate("|", disjuncts)
+
+    def add(self, literals: array) -> Optional[int]:
+        """Stores a clause. Returns its id, or None if it was already stored, in
+        which case only its reference count grows."""
+        cid = self._insert(literals)
+        if cid is None:
+            return None
+        for lit in literals:
+            self.occurrences.setdefault(lit, set()).add(cid)
+        return cid
+
+    def _insert(self, literals: array) -> Optional[int]:
+        key = literals.tobytes()
+        cid = self.lookup().get(key)
+        if cid is not None:
+            self._counts[cid] += 1
+            return None
+        if self._free:
+            cid = self._free.pop()
+            self._clauses[cid] = literals
+            self._counts[cid] = 1
+        else:
+            cid = len(self._clauses)
+            self._clauses.append(literals)
+            self._counts.append(1)
+        self._lookup[key] = cid
+        return cid
+
+    def add_many(self, clauses: Iterable[array]) -> List[int]:
+        """Stores a batch of clauses, skipping duplicates, and indexes their
+        literals once at the end. Returns the ids of the new clauses."""
+        cids = []
+        for literals in clauses:
+            cid = self._insert(literals)
+            if cid is not None:
+                cids.append(cid)
+
+        occurrences = self.occurrences
+        for cid in cids:
+            for lit in self._clauses[cid]:
+                occurrence = occurrences.get(lit)
+                if occurrence is None:
+                    occurrences[lit] = {cid}
+                else:
+                    occurrence.add(cid)
+        return cids
+
+    def restore(self, names: List[str], clauses: Sequence[Sequence[int]], counts: Sequence[int],
+                occurrences: Optional[OccurrenceIndex] = None) -> None:
+        """Fills an empty store with the symbol names (by id, "" for ids of no
+        symbol), clauses and reference counts of a snapshot, and optionally
+        its packed occurrence index. Clauses and counts may be read-only
+        sequences, e.g. views of a memory-mapped file (see PackedClauses):
+        they are not copied, and the entries that change are kept apart. The
+        clause lookup is built when first needed."""
+        assert not self._clauses, "restore needs an empty store"
+        self.symbols.restore(names)
+        self._clauses = CopyOnWriteList(clauses)
+        self._counts = CopyOnWriteList(counts)
+        self._lookup = None
+        if occurrences is not None:
+            self.occurrences = occurrences
+            return
+        for cid, literals in enumerate(clauses):
+            for lit in literals:
+                self.occurrences.setdefault(lit, set()).add(cid)
+
+    def remove(self, literals: array) -> Optional[int]:
+        """Drops one reference to a clause, removing it when none is left.
+        Returns its former id, or None if it was not removed."""
+        key = literals.tobytes()
+        lookup = self.lookup()
+        cid = lookup.get(key)
+        if cid is None:
+            return None
+        self._counts[cid] -= 1
+        if self._counts[cid]:
+            return None
+        del lookup[key]
+        for lit in literals:
+            self.occurrences[lit].discard(cid)
+        self._clauses[cid] = None
+        self._free.append(cid)
+        return cid
+
+    def component(self, seeds: Iterable[int], facts: AbstractSet[int] = frozenset(), max_pairs: int = 64,
+                  keep_seeds: bool = True) -> List[List[int]]:
+        """Returns the clauses connected to the seed variables through shared
+        variables, simplified by the `facts` literals: clauses that a fact
+        satisfies are skipped and literals that a fact falsifies are removed.
+
+        A variable that is not a seed is eliminated when every clause with one
+        of its literals is blocked, i.e. each resolvent on that literal is a
+        tautology (this is the case for the breeze of an unvisited cell, which
+        only appears in its own definition). Dropping those clauses preserves
+        satisfiability, so the component together with clauses over the seeds
+        is satisfiable iff the whole store with them is, as long as the
+        clauses outside the component are consistent. Without `keep_seeds`
+        the seeds may be eliminated too, e.g. when only the satisfiability of
+        the clauses around them matters."""
+        seeds = set(seeds)
+        kept = seeds if keep_seeds else set()
+        residuals: Dict[int, Optional[List[int]]] = {}
+        included: Dict[int, List[int]] = {}
+        eliminated: Set[int] = set()
+
+        def residual(cid: int) -> Optional[List[int]]:
+            if cid not in residuals:
+                clause = self._clauses[cid]
+                if any(lit in facts for lit in clause):
+                    residuals[cid] = None
+                else:
+                    residuals[cid] = [lit for lit in clause if -lit not in facts]
+            return residuals[cid]
+
+        def live(lit: int) -> List[int]:
+            return [cid for cid in self.occurrences.get(lit, ()) if cid not in eliminated and residual(cid) is not None]
+
+        def blocked(var: int) -> bool:
+            for lit in (var, -var):
+                clauses, partners = live(lit), live(-lit)
+                if len(clauses) * len(partners) > max_pairs:
+                    continue
+                partner_sets = [set(residual(cid)) for cid in partners]
+                if all(any(-x in partner for x in residual(cid) if x != lit) for cid in clauses for partner in partner_sets):
+                    return True
+            return False
+
+        visited = set(seeds)
+        stack = list(seeds)
+        while stack:
+            var = stack.pop()
+            for cid in live(var) + live(-var):
+                if cid in included or cid in eliminated:
+                    continue
+                clause = residual(cid)
+                free = next((abs(lit) for lit in clause if abs(lit) not in kept and blocked(abs(lit))), None)
+                if free is not None:
+                    for other in live(free) + live(-free):
+                        eliminated.add(other)
+                        included.pop(other, None)
+                    continue
+                included[cid] = clause
+                for lit in clause:
+                    if abs(lit) not in visited:
+                        visited.add(abs(lit))
+                        stack.append(abs(lit))
+        return list(included.values())
@@ -0,0 +1,249 @@
+from itertools import count
+from typing import Dict, List, Tuple
+import time
+from expression import Expr
+from stats import STATS
+
+Clause = Tuple[Expr, ...]
+
+class CNFConverter:
+    """Converts propositional sentences to conjunctive normal form.
+
+    Every pass walks the sentence with an explicit stack, so deep sentences
+    cannot hit the recursion limit, and memoizes shared subexpressions (Exprs
+    are hash-consed, so a sentence is a DAG). Converted sentences are cached.
+
+    By default CNF is obtained by distributing | over &, which can grow
+    exponentially. With `tseitin=True` every compound subformula that is not
+    already a clause gets an auxiliary symbol `Aux_<n>` defined by a few
+    clauses, which keeps the CNF linear in the size of the sentence and
+    equisatisfiable with it. A subformula always gets the same symbol, so
+    converting a sentence again yields the same clauses.
+    """
+
+    TRUE, FALSE = Expr("TRUE"), Expr("FALSE")
+    _aux_ids = count(1)
+
+    def __init__(self, maxsize: int = 1 << 16):
+        self.maxsize = maxsize
+        self._cache: Dict[Tuple[Expr, bool], Expr] = {}
+        self._aux: Dict[Expr, Expr] = {}
+
+    def convert(self, s: "Expr", tseitin: bool = False) -> "Expr":
+        """Returns the CNF of s as a conjunction of disjunctions of literals."""
+        key = (s, tseitin)
+        cnf = self._cache.get(key)
+        if cnf is None:
+            started = time.perf_counter() if STATS.enabled else 0.0
+            nnf = self.negation_normal_form(self.eliminate_implications(s))
+            clauses = self.tseitin_clauses(nnf) if tseitin else self.distribute(nnf)
+            cnf = self.to_expr(clauses)
+            if len(self._cache) >= self.maxsize:
+                del self._cache[next(iter(self._cache))]  # Drop the oldest entry
+            self._cache[key] = cnf
+            if STATS.enabled:
+                STATS.record("cnf", time.perf_counter() - started)
+        elif STATS.enabled:
+            STATS.count("cnf.cache_hits")
+        return cnf
+
+    @classmethod
+    def reserve_aux(cls, last: int) -> None:
+        """Makes sure new auxiliary symbols are numbered after Aux_<last>, e.g.
+        once clauses with auxiliary symbols were loaded from a file."""
+        cls._aux_ids = count(max(next(cls._aux_ids), last + 1))
+
+    def definitions(self) -> List[Tuple[str, str, List[str]]]:
+        """Returns the subformulas named by auxiliary symbols, in the order they
+        were named, as (symbol, op, args) where each compound argument is
+        given by its own symbol."""
+        return [(str(aux), node.op, [str(self._aux[arg]) if arg.op in ("&", "|") else str(arg) for arg in node.args])
+                for node, aux in self._aux.items()]
+
+    def define(self, definitions: List[Tuple[str, str, List[str]]]) -> Dict[str, str]:
+        """Names subformulas returned by `definitions` (e.g. of a saved KB), so
+        that converting the sentences they came from again yields the same
+        clauses. A symbol that already names another subformula here is
+        replaced by the existing or a new one. Returns those renamings."""
+        used = {str(aux) for aux in self._aux.values()}
+        nodes: Dict[str, Expr] = {}
+        renamed = {}
+        for name, op, args in definitions:
+            node = Expr(op, *(nodes[arg] if arg in nodes else
+                              Expr("~", Expr(arg[1:])) if arg.startswith("~") else Expr(arg) for arg in args))
+            nodes[name] = node
+            aux = self._aux.get(node)
+            if aux is None:
+                aux = Expr(name) if name not in used else Expr(f"Aux_{next(self._aux_ids)}")
+                self._aux[node] = aux
+                used.add(str(aux))
+            if str(aux) != name:
+                renamed[name] = str(aux)
+        return renamed
+
+    @staticmethod
+    def is_atom(s: "Expr") -> bool:
+        return not s.args or Expr.is_symbol(s.op)
+
+    def eliminate_implications(self, s: "Expr") -> "Expr":
+        """Change >>, <<, <=> and ^ into &, |, and ~."""
+        done: Dict[Expr, Expr] = {}
+        stack = [s]
+        while stack:
+            node = stack[-1]
+            if node in done:
+                stack.pop()
+                continue
+            if self.is_atom(node):
+                done[node] = stack.pop()
+                continue
+            pending = [arg for arg in node.args if arg not in done]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+
+            args = [done[arg] for arg in node.args]
+            a, b = args[0], args[-1]
+            if node.op == ">>":
+                done[node] = b | ~a
+            elif node.op == "<<":
+                done[node] = a | ~b
+            elif node.op == "<=>":
+                done[node] = (a | ~b) & (b | ~a)
+            elif node.op == "^":
+                assert len(args) == 2
+                done[node] = (a & ~b) | (~a & b)
+            elif node.op in ("&", "|", "~"):
+                done[node] = Expr(node.op, *args)
+            else:
+                raise ValueError(f"Illegal operator in logic expression: {node}")
+        return done[s]
+
+    def negation_normal_form(self, s: "Expr") -> "Expr":
+        """Moves negations inward until they only apply to atoms, flattening
+        nested conjunctions and disjunctions."""
+        done: Dict[Tuple[Expr, bool], Expr] = {}
+        stack = [(s, True)]
+        while stack:
+            key = stack[-1]
+            if key in done:
+                stack.pop()
+                continue
+            node, positive = key
+            if node.op == "~":
+                inner = (node.args[0], not positive)
+                if inner in done:
+                    done[key] = done[inner]
+                    stack.pop()
+                else:
+                    stack.append(inner)
+                continue
+            if node.op not in ("&", "|") or self.is_atom(node):
+                done[key] = node if positive else ~node
+                stack.pop()
+                continue
+
+            children = [(arg, positive) for arg in node.args]
+            pending = [child for child in children if child not in done]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            op = node.op if positive else ("|" if node.op == "&" else "&")
+            done[key] = self.associate(op, [done[child] for child in children])
+        return done[(s, True)]
+
+    def distribute(self, s: "Expr") -> List[Clause]:
+        """Converts a sentence in negation normal form into a list of clauses by
+        distributing disjunctions over conjunctions."""
+        done: Dict[Expr, List[Clause]] = {}
+        stack = [s]
+        while stack:
+            node = stack[-1]
+            if node in done:
+                stack.pop()
+                continue
+            if node.op not in ("&", "|"):
+                done[node] = [(node,)]
+                stack.pop()
+                continue
+            pending = [arg for arg in node.args if arg not in done]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+
+            if node.op == "&":
+                clauses = [clause for arg in node.args for clause in done[arg]]
+            else:
+                # Repeated literals are merged and tautologies dropped as we go
+                clauses = [()]
+                for arg in node.args:
+                    product = []
+                    for a in clauses:
+                        for b in done[arg]:
+                            clause = tuple(dict.fromkeys(a + b))
+                            if not any(self.negate(lit) in clause for lit in b):
+                                product.append(clause)
+                    clauses = product
+            done[node] = list(dict.fromkeys(clauses))
+        return done[s]
+
+    def tseitin_clauses(self, s: "Expr") -> List[Clause]:
+        """Converts a sentence in negation normal form into a list of clauses,
+        naming every compound subformula below the top-level clauses."""
+        clauses: List[Clause] = []
+        defined = set()
+        for conjunct in (s.args if s.op == "&" else [s]):
+            disjuncts = conjunct.args if conjunct.op == "|" else [conjunct]
+            clauses.append(tuple(self.tseitin_literal(d, clauses, defined) for d in disjuncts))
+        return clauses
+
+    def tseitin_literal(self, s: "Expr", clauses: List[Clause], defined: set) -> "Expr":
+        """Returns a literal equivalent to s, adding the definitions of the
+        auxiliary symbols it needs to `clauses`."""
+        stack = [s]
+        while stack:
+            node = stack[-1]
+            if node.op not in ("&", "|") or node in defined:
+                stack.pop()
+                continue
+            pending = [arg for arg in node.args if arg.op in ("&", "|") and arg not in defined]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+
+            aux = self._aux.get(node)
+            if aux is None:
+                aux = self._aux[node] = Expr(f"Aux_{next(self._aux_ids)}")
+            args = [self._aux[arg] if arg.op in ("&", "|") else arg for arg in node.args]
+            if node.op == "&":
+                clauses.extend((~aux, arg) for arg in args)
+                clauses.append((aux, *map(self.negate, args)))
+            else:
+                clauses.append((~aux, *args))
+                clauses.extend((aux, self.negate(arg)) for arg in args)
+            defined.add(node)
+        return self._aux[s] if s.op in ("&", "|") else s
+
+    @staticmethod
+    def negate(literal: "Expr") -> "Expr":
+        return literal.args[0] if literal.op == "~" else ~literal
+
+    def associate(self, op: str, args: List["Expr"]) -> "Expr":
+        """Returns Expr(op, *args) with nested uses of op flattened."""
+        flat = []
+        for arg in args:
+            if arg.op == op:
+                flat.extend(arg.args)
+            else:
+                flat.append(arg)
+        if not flat:
+            return self.TRUE if op == "&" else self.FALSE
+        return flat[0] if len(flat) == 1 else Expr(op, *flat)
+
+    def to_expr(self, clauses: List[Clause]) -> "Expr":
+        """Builds the conjunction of a list of clauses."""
+        return self.associate("&", [self.associate("|", list(clause)) for clause in clauses])
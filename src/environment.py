@@ -1,11 +1,118 @@
 import random
+from typing import Optional, Union
+import numpy as np
+from percept import Percept
+
+EMPTY, PIT, WUMPUS, GOLD = range(4)
+
+
+def adjacent(mask: np.ndarray) -> np.ndarray:
+    """Returns the mask of the cells next to a cell of the given mask. Works on
+    a single grid or on a stack of grids (the last two axes)."""
+    near = np.zeros_like(mask)
+    near[..., 1:, :] |= mask[..., :-1, :]
+    near[..., :-1, :] |= mask[..., 1:, :]
+    near[..., :, 1:] |= mask[..., :, :-1]
+    near[..., :, :-1] |= mask[..., :, 1:]
+    return near
+
+
+class WorldGenerator:
+    """Generates Wumpus worlds as uint8 grids of cell types from a NumPy random
+    generator (or a seed for one), so worlds are reproducible.
+
+    Each world has one wumpus and one gold on two distinct cells other than
+    the player's, and a pit on every other such cell with probability
+    `pit_probability`. A batch of worlds is drawn at once as a stacked
+    (count, size, size) array.
+    """
+
+    def __init__(self, rng: Union[np.random.Generator, int, None] = None):
+        self.rng = rng if isinstance(rng, np.random.Generator) else np.random.default_rng(rng)
+
+    def generate(self, grid_size: int, player_position: tuple = (0, 0), pit_probability: float = 0.2) -> np.ndarray:
+        """Returns one world."""
+        return self.batch(1, grid_size, player_position, pit_probability)[0]
+
+    def batch(self, count: int, grid_size: int, player_position: tuple = (0, 0), pit_probability: float = 0.2,
+              solvable: bool = False, max_attempts: int = 1000) -> np.ndarray:
+        """Returns `count` worlds stacked in one array. With `solvable` only worlds
+        whose gold can be reached without taking a risk are kept (see
+        `is_solvable`), drawing up to `max_attempts` batches. Raises ValueError
+        if they hold fewer solvable worlds than requested."""
+        if not solvable:
+            return self._draw(count, grid_size, player_position, pit_probability)
+        worlds = []
+        found = 0
+        for _ in range(max_attempts):
+            if found >= count:
+                break
+            grids = self._draw(count, grid_size, player_position, pit_probability)
+            grids = grids[self.is_solvable(grids, player_position)]
+            worlds.append(grids[:count - found])
+            found += len(worlds[-1])
+        if found < count:
+            raise ValueError(f"Only {found} of {count} worlds were solvable after {max_attempts} batches")
+        return np.concatenate(worlds)
+
+    def _draw(self, count: int, grid_size: int, player_position: tuple, pit_probability: float) -> np.ndarray:
+        cells = grid_size * grid_size
+        player = np.ravel_multi_index(player_position, (grid_size, grid_size))
+        grids = np.where(self.rng.random((count, cells)) < pit_probability, PIT, EMPTY).astype(np.uint8)
+        grids[:, player] = EMPTY
+
+        # The two cells with the smallest random keys are a uniform pair of distinct cells
+        keys = self.rng.random((count, cells))
+        keys[:, player] = np.inf
+        pair = np.argpartition(keys, 2, axis=1)[:, :2]
+        rows = np.arange(count)
+        grids[rows, pair[:, 0]] = WUMPUS
+        grids[rows, pair[:, 1]] = GOLD
+        return grids.reshape(count, grid_size, grid_size)
+
+    @staticmethod
+    def is_solvable(grids: np.ndarray, player_position: tuple = (0, 0)) -> np.ndarray:
+        """Returns for each world whether a logical agent reaches the gold only
+        through cells proven safe. A cell is proven safe once it is next to a
+        visited cell without breeze and to a visited cell without stench, so
+        the safe region is grown from the player to a fixpoint, for all worlds
+        at once."""
+        grids = np.asarray(grids)
+        grids = grids.reshape((-1,) + grids.shape[-2:])
+        calm = ~adjacent(grids == PIT)
+        odorless = ~adjacent(grids == WUMPUS)
+        visited = np.zeros(grids.shape, dtype=bool)
+        visited[(slice(None),) + tuple(player_position)] = True
+        while True:
+            safe = visited | (adjacent(visited & calm) & adjacent(visited & odorless))
+            if (safe == visited).all():
+                break
+            visited = safe
+        return (visited & (grids == GOLD)).any(axis=(1, 2))
+
 
 class Environment:
-    def __init__(self, grid_size: int = 4, player_position: tuple = (0, 0)):
+    """A square Wumpus world stored as a grid of cell types.
+
+    `grid[x, y]` holds one of EMPTY, PIT, WUMPUS or GOLD. The breeze, stench
+    and glitter of every cell are precomputed as boolean masks (shifting the
+    pit and wumpus masks onto their neighbors), and the wumpus and gold
+    positions are tracked, so percepts are lookups.
+    """
+    SYMBOLS = "oPWG"
+    
+    def __init__(self, grid_size: int = 4, player_position: tuple = (0, 0), pit_probability: float = 0.2,
+                 rng: Optional[np.random.Generator] = None, grid: Optional[np.ndarray] = None):
         # the map is always a square
         self.grid_size = grid_size
         self.player_position = player_position
-        self.generate_map()
+        self.pit_probability = pit_probability
+        # Without a generator, worlds follow the seed of the random module
+        self.rng = rng if rng is not None else np.random.default_rng(random.getrandbits(64))
+        if grid is None:
+            self.generate_map()
+        else:
+            self.load_map(grid)
         # self.map = [
         #     ['o', 'o', 'o', 'P'],
         #     ['W', 'G', 'P', 'o'],
@@ -14,42 +121,35 @@ class Environment:
         # ] UN MAPA QUE PODEMOS USAR DE EJEMPLO
         
     
-    def get_random_position(self, start: int = 0, end: int = None):
-        return (random.randint(start, end - 1), random.randint(start, end - 1))
-        
     def generate_map(self):
-        self.map = [['o' for _ in range(self.grid_size)] for _ in range(self.grid_size)]
-        
-        # Place the wumpus
-        wumpus_position = self.get_random_position(0, self.grid_size)
-        while wumpus_position == self.player_position:
-            wumpus_position = self.get_random_position(0, self.grid_size)
-        self.map[wumpus_position[0]][wumpus_position[1]] = 'W'
-        
-        # Place the gold
-        gold_position = self.get_random_position(0, self.grid_size)
-        while gold_position == self.player_position or gold_position == wumpus_position:
-            gold_position = self.get_random_position(0, self.grid_size)
-        self.map[gold_position[0]][gold_position[1]] = 'G'
-        
-        # Place the pits
-        for y in range(self.grid_size):
-            for x in range(self.grid_size):
-                if (x, y) == self.player_position or (x, y) == wumpus_position or (x, y) == gold_position:
-                    continue
-                if random.random() < 0.2:
-                    self.map[y][x] = 'P'
+        self.load_map(WorldGenerator(self.rng).generate(self.grid_size, self.player_position, self.pit_probability))
+    
+    def load_map(self, grid):
+        """Uses the given grid of cell types (e.g. one world of a batch)."""
+        self.grid = np.array(grid, dtype=np.uint8)
+        self.grid_size = len(self.grid)
+        wumpus = np.argwhere(self.grid == WUMPUS)
+        gold = np.argwhere(self.grid == GOLD)
+        self.wumpus_position = tuple(map(int, wumpus[0])) if len(wumpus) else None
+        self.gold_position = tuple(map(int, gold[0])) if len(gold) else None
+        self.update_masks()
+    
+    def update_masks(self):
+        """Recomputes the breeze, stench and glitter masks from the grid."""
+        self.breeze = adjacent(self.grid == PIT)
+        self.stench = adjacent(self.grid == WUMPUS)
+        self.glitter = self.grid == GOLD
     
     def get_map(self):
-        return self.map
+        return [[self.SYMBOLS[cell] for cell in row] for row in self.grid.tolist()]
     
     def print_map(self, player_position: tuple = None):
-        for x in range(self.grid_size):
-            for y in range(self.grid_size):
+        for x, row in enumerate(self.get_map()):
+            for y, symbol in enumerate(row):
                 if player_position is not None and (x, y) == player_position:
                     print('♥', end=' ')
                 else:
-                    print(self.map[x][y], end=' ')
+                    print(symbol, end=' ')
             print()
     
     def get_nearby_cells(self, position):
@@ -58,67 +158,53 @@ class Environment:
         nearby_cells = []
         for dx, dy in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
             new_x, new_y = x + dx, y + dy
-            if 0 <= new_x < len(self.map) and 0 <= new_y < len(self.map[0]):
+            if 0 <= new_x < self.grid_size and 0 <= new_y < self.grid_size:
                 nearby_cells.append((new_x, new_y))
         return nearby_cells
     
-    def get_percept(self, position):
-        percept = [None, None, None, None, None]
-        nearby_cells = self.get_nearby_cells(position)
-        
+    def get_percept(self, position) -> Percept:
         # Check if the player perceives a bump
         if not self.is_valid_position(position):
-            percept[3] = 'Bump'
+            return Percept.BUMP
         
-        # Only check the rest of the percepts if the player did not perceive a bump
-        if percept[3] is None:
-            # Check for pits, wumpus, and gold in nearby cells
-            for cell in nearby_cells:
-                if self.is_pit(cell):
-                    percept[1] = 'Breeze'
-                if self.is_wumpus(cell):
-                    percept[0] = 'Stench'
-            
-            # Check for gold in the current cell
-            if self.is_gold(position):
-                percept[2] = 'Glitter'
-                
-            
-            # Check if the wumpus is alive
-            if not self.is_wumpus_alive():
-                percept[4] = 'Scream'
-
+        percept = Percept.NONE
+        if self.stench[position]:
+            percept |= Percept.STENCH
+        if self.breeze[position]:
+            percept |= Percept.BREEZE
+        if self.glitter[position]:
+            percept |= Percept.GLITTER
+        if not self.is_wumpus_alive():
+            percept |= Percept.SCREAM
         return percept
     
     def is_valid_position(self, position):
         x, y = position
-        return 0 <= x < len(self.map) and 0 <= y < len(self.map[0])
+        return 0 <= x < self.grid_size and 0 <= y < self.grid_size
     
     def is_pit(self, position):
-        x, y = position
-        return self.map[x][y] == 'P'
+        return bool(self.grid[position] == PIT)
     
     def is_wumpus(self, position):
-        x, y = position
-        return self.map[x][y] == 'W'
+        return bool(self.grid[position] == WUMPUS)
     
     def is_gold(self, position):
-        x, y = position
-        return self.map[x][y] == 'G'
+        return bool(self.grid[position] == GOLD)
     
     def is_wumpus_alive(self):
-        return any('W' in row for row in self.map)
+        return self.wumpus_position is not None
     
     def remove_wumpus(self):
-        for x in range(len(self.map)):
-            for y in range(len(self.map[0])):
-                if self.map[x][y] == 'W':
-                    self.map[x][y] = 'o'
-                    return
+        if self.wumpus_position is None:
+            return
+        self.grid[self.wumpus_position] = EMPTY
+        for cell in self.get_nearby_cells(self.wumpus_position):
+            self.stench[cell] = False
+        self.wumpus_position = None
                 
     def remove_gold(self):
-        for x in range(len(self.map)):
-            for y in range(len(self.map[0])):
-                if self.map[x][y] == 'G':
-                    self.map[x][y] = 'o'
-                    return
\ No newline at end of file
+        if self.gold_position is None:
+            return
+        self.grid[self.gold_position] = EMPTY
+        self.glitter[self.gold_position] = False
+        self.gold_position = None
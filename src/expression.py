@@ -1,22 +1,48 @@
-from typing import Any, Union
+from functools import lru_cache
+from typing import Any, List, Union
 import re
+import time
+import weakref
+from stats import STATS
 
 class Expr:
-    """Represents logical expressions using operators and arguments."""
+    """Represents logical expressions using operators and arguments.
 
-    def __init__(self, op: Union[str, int], *args: Any) -> None:
-        self.op = op
-        self.args = list(map(Expr.create_expression, args)) ## Coerce args to Exprs
+    Exprs are immutable and hash-consed: building an expression equal to one
+    that is still alive returns that same object, so equality is identity and
+    the hash is computed only once."""
+
+    __slots__ = ("op", "args", "_hash", "__weakref__")
+    _interned: "weakref.WeakValueDictionary" = weakref.WeakValueDictionary()
+
+    def __new__(cls, op: Union[str, int], *args: Any) -> "Expr":
+        args = tuple(map(Expr.create_expression, args)) ## Coerce args to Exprs
+        key = (op, args)
+        expr = cls._interned.get(key)
+        if expr is None:
+            expr = object.__new__(cls)
+            object.__setattr__(expr, "op", op)
+            object.__setattr__(expr, "args", args)
+            object.__setattr__(expr, "_hash", hash(key))
+            cls._interned[key] = expr
+        return expr
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Expr is immutable")
+
+    def __reduce__(self):
+        return (Expr, (self.op, *self.args))
 
     @staticmethod
     def create_expression(s: Union[str, int]) -> "Expr":
         if isinstance(s, Expr):
             return s
-        if s.isnumeric():
-            return Expr(s)
-        s = s.replace("==>", ">>").replace("<==", "<<").replace("<=>", "%").replace("=/=", "^")
-        s = re.sub(r'([a-zA-Z0-9_.]+)', r'Expr("\1")', s)
-        return eval(s, {"Expr": Expr})
+        if STATS.enabled:
+            started = time.perf_counter()
+            expr = parse_expression(s)
+            STATS.record("parse", time.perf_counter() - started)
+            return expr
+        return parse_expression(s)
     
     def __call__(self, *args):
         """Self must be a symbol with no args, such as Expr('F').  Create a new
@@ -36,16 +62,16 @@ class Expr:
             return '(%s)' % (' '+self.op+' ').join(map(repr, self.args))
 
     def __eq__(self, other):
-        """x and y are equal iff their ops and args are equal."""
-        return (other is self) or (isinstance(other, Expr)
-            and self.op == other.op and self.args == other.args)
+        """x and y are equal iff their ops and args are equal, which for
+        interned Exprs means they are the same object."""
+        return other is self
 
     def __ne__(self, other):
-        return not self.__eq__(other)
+        return other is not self
 
     def __hash__(self):
         "Need a hash method so Exprs can live in dicts."
-        return hash(self.op) ^ hash(tuple(self.args))
+        return self._hash
     
     @staticmethod
     def is_symbol(s: str) -> bool:
@@ -72,3 +98,109 @@ class Expr:
     def __xor__(self, other):    return Expr('^',  self, other)
     def __mod__(self, other):    return Expr('<=>',  self, other)
 
+
+class ExprParser:
+    """Tokenizer and precedence-climbing parser for logic sentences.
+
+    From loosest to tightest binding: <=>, ==> and <== (right associative),
+    |, ^ (also written =/=), & and prefix ~. Symbols may be applied to
+    arguments, as in F(x, y). >>, << and % are accepted as aliases of ==>,
+    <== and <=>.
+    """
+
+    TOKEN = re.compile(r"\s*(?:(<=>|==>|<==|=/=|>>|<<|[~&|^%(),])|([a-zA-Z0-9_.]+))")
+    SYMBOL = re.compile(r"[a-zA-Z0-9_.]+")
+    ALIASES = {">>": "==>", "<<": "<==", "%": "<=>", "=/=": "^"}
+    # token -> (precedence, right associative, Expr operator)
+    BINARY_OPS = {
+        "<=>": (1, True, "<=>"),
+        "==>": (2, True, ">>"),
+        "<==": (2, True, "<<"),
+        "|": (3, False, "|"),
+        "^": (4, False, "^"),
+        "&": (5, False, "&"),
+    }
+
+    def __init__(self, text: str) -> None:
+        self.text = text
+        self.tokens = self.tokenize(text)
+        self.pos = 0
+
+    @classmethod
+    def tokenize(cls, text: str) -> List[str]:
+        """Splits a sentence into operator and symbol tokens."""
+        tokens = []
+        pos, end = 0, len(text.rstrip())
+        while pos < end:
+            match = cls.TOKEN.match(text, pos)
+            if match is None:
+                raise ValueError(f"Unexpected character {text[pos:].strip()[:1]!r} in {text!r}")
+            operator, symbol = match.groups()
+            tokens.append(cls.ALIASES.get(operator, operator) if operator else symbol)
+            pos = match.end()
+        return tokens
+
+    def parse(self) -> Expr:
+        """Parses the whole sentence."""
+        expr = self.parse_binary(1)
+        if self.pos < len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.pos]!r} in {self.text!r}")
+        return expr
+
+    def parse_binary(self, min_precedence: int) -> Expr:
+        left = self.parse_unary()
+        while self.pos < len(self.tokens) and self.tokens[self.pos] in self.BINARY_OPS:
+            precedence, right_assoc, op = self.BINARY_OPS[self.tokens[self.pos]]
+            if precedence < min_precedence:
+                break
+            self.pos += 1
+            right = self.parse_binary(precedence if right_assoc else precedence + 1)
+            left = Expr(op, left, right)
+        return left
+
+    def parse_unary(self) -> Expr:
+        if self.peek() == "~":
+            self.pos += 1
+            return Expr("~", self.parse_unary())
+        return self.parse_atom()
+
+    def parse_atom(self) -> Expr:
+        token = self.next()
+        if token == "(":
+            expr = self.parse_binary(1)
+            self.expect(")")
+            return expr
+        if token is None or not self.SYMBOL.fullmatch(token):
+            raise ValueError(f"Expected a symbol but found {token!r} in {self.text!r}")
+        if self.peek() != "(":
+            return Expr(token)
+        self.pos += 1
+        args = []
+        if self.peek() != ")":
+            args.append(self.parse_binary(1))
+            while self.peek() == ",":
+                self.pos += 1
+                args.append(self.parse_binary(1))
+        self.expect(")")
+        return Expr(token, *args)
+
+    def peek(self) -> Union[str, None]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def next(self) -> Union[str, None]:
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def expect(self, token: str) -> None:
+        if self.next() != token:
+            raise ValueError(f"Expected {token!r} in {self.text!r}")
+
+
+@lru_cache(maxsize=1 << 16)
+def parse_expression(s: str) -> Expr:
+    """Parses a sentence. Results are cached by source string; this is safe
+    because Exprs are immutable."""
+    if STATS.enabled:
+        STATS.count("parse.misses")
+    return ExprParser(s).parse()
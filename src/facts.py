@@ -0,0 +1,103 @@
+from array import array
+from typing import Iterable, List, Optional, Set
+from clausestore import ClauseStore
+
+class FactCache:
+    """The set of literals that follow from a clause store by unit propagation.
+
+    Facts are extended incrementally as clauses are added. Removing a clause
+    that may have produced a fact can invalidate any of them, so the cache
+    is then marked stale and recomputed from the store the next time it is
+    read.
+    """
+
+    def __init__(self, store: ClauseStore):
+        self.store = store
+        self.facts: Set[int] = set()
+        self.consistent = True
+        self._stale = False
+
+    def __len__(self) -> int:
+        self._refresh()
+        return len(self.facts)
+
+    def known(self) -> Set[int]:
+        """Returns the set of literals known to be true."""
+        self._refresh()
+        return self.facts
+
+    def is_consistent(self) -> bool:
+        """Returns False if propagation finds a conflict in the store."""
+        self._refresh()
+        return self.consistent
+
+    def value(self, literal: int) -> Optional[bool]:
+        """Returns True if the literal is a known fact, False if its negation is,
+        and None if propagation cannot decide. A store where propagation finds
+        a conflict entails every literal. Propagation does not find every
+        conflict, so False and None only hold once the store is known to be
+        satisfiable (see KnowledgeBase.satisfiable)."""
+        self._refresh()
+        if not self.consistent or literal in self.facts:
+            return True
+        if -literal in self.facts:
+            return False
+        return None
+
+    def add_clause(self, cid: int) -> None:
+        """Propagates a clause that was just added to the store."""
+        if not self._stale:
+            self._propagate([cid])
+
+    def add_clauses(self, cids: List[int]) -> None:
+        """Propagates a batch of clauses that were just added to the store."""
+        if not self._stale:
+            self._propagate(list(cids))
+
+    def remove_clause(self, literals: array) -> None:
+        """Invalidates the facts after a clause was removed from the store, unless
+        the clause cannot be the reason of any fact: a clause only becomes
+        unit once all but one of its literals are false, and facts never
+        become unknown while clauses are only added."""
+        if self._stale:
+            return
+        open_literals = sum(1 for lit in literals if -lit not in self.facts)
+        if open_literals <= 1 or not self.consistent:
+            self._stale = True
+
+    def restore(self, facts: Iterable[int], consistent: bool) -> None:
+        """Replaces the facts with ones computed earlier for the same store."""
+        self.facts = set(facts)
+        self.consistent = consistent
+        self._stale = False
+
+    def invalidate(self) -> None:
+        """Marks the facts stale after clauses were removed from the store."""
+        self._stale = True
+
+    def _refresh(self) -> None:
+        if not self._stale:
+            return
+        self._stale = False
+        self.facts.clear()
+        self.consistent = True
+        self._propagate([cid for cid, _ in self.store.items()])
+
+    def _propagate(self, cids: List[int]) -> None:
+        """Examines clauses, adding the remaining literal of every clause that
+        became unit and then examining the clauses where its negation occurs."""
+        while cids and self.consistent:
+            unit = None
+            for lit in self.store.clause(cids.pop()):
+                if lit in self.facts:
+                    break
+                if -lit not in self.facts:
+                    if unit is not None:
+                        break
+                    unit = lit
+            else:
+                if unit is None:
+                    self.consistent = False
+                else:
+                    self.facts.add(unit)
+                    cids.extend(self.store.occurrences.get(-unit, ()))
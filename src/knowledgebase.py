@@ -1,12 +1,50 @@
-from typing import Any, Generator, List, Union
+import mmap
+from array import array
+from typing import Any, Dict, Generator, Iterable, List, Optional, Sequence, Set, Union
+import time
+from clausestore import ClauseStore
 from expression import Expr
+from facts import FactCache
 from logic import Logic
+from snapshot import read_snapshot, write_snapshot
+from solver import SOLVERS, CDCLSolver
+from stats import STATS
 
 class KnowledgeBase:
-    """A base class for Knowledge Base (KB) systems."""
-    def __init__(self):
-        self.clauses: List[Expr] = []
+    """A base class for Knowledge Base (KB) systems.
+
+    The entailment engine is selected with `engine`: "cdcl" (default) and
+    "dpll" prove KB |= a by refuting KB & ~a with a SAT solver, "tt" uses
+    truth-table enumeration and "vtt" a NumPy truth table (falling back to
+    cdcl when too many symbols are involved). With `incremental` the cdcl
+    engine keeps one solver across calls: told clauses are added to it, and
+    queries are answered under assumptions, reusing its top-level facts and
+    learnt clauses. With `tseitin` told sentences are converted to CNF with
+    auxiliary symbols instead of by distribution. The other engines only see the part of the KB connected
+    to the query, once simplified by the known facts. Literal queries are
+    first looked up in a cache of the facts that follow from the KB by unit
+    propagation.
+    """
+    ENGINES = ("cdcl", "dpll", "tt", "vtt")
+
+    def __init__(self, engine: str = "cdcl", incremental: bool = True, tseitin: bool = False):
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown entailment engine: {engine}")
+        self.store = ClauseStore()
+        self.facts = FactCache(self.store)
         self.logic = Logic()
+        self.engine = engine
+        self.queries = 0  # Queries asked with ask and ask_many
+        self.incremental = incremental and engine == "cdcl"
+        self.tseitin = tseitin
+        self._solver = None
+        # Whether the KB was satisfiable when last checked, and the variables of
+        # the clauses told since then (None when the whole KB must be checked)
+        self._satisfiable = True
+        self._unchecked: Optional[Set[int]] = set()
+        if engine == "vtt":
+            from truthtable import VectorizedTruthTable  # NumPy is only needed here
+            self._truth_table = VectorizedTruthTable(self.logic)
 
     def ask(self, query: Any) -> Union[dict, bool]:
         """Returns a substitution that makes the query true, or False if not found."""
@@ -14,26 +52,332 @@ class KnowledgeBase:
         if isinstance(query, str):
             query = Expr.create_expression(query)
         
+        self.queries += 1
+        if not STATS.enabled:
+            return self.entails(query)
+        started = time.perf_counter()
+        entailed = self.entails(query)
+        STATS.record("kb.ask", time.perf_counter() - started)
+        return entailed
+    
+    def entails(self, query: "Expr") -> bool:
+        """Like `ask` for an expression, without counting it as a query."""
         for _ in self.ask_generator(query):
             return True
         return False
 
+    def ask_many(self, queries: List[Any]) -> List[Optional[bool]]:
+        """Answers a batch of queries at once. For each query returns True if
+        the KB entails it, False if the KB entails its negation and None if
+        neither is known.
+
+        Literals decided by the fact cache are answered directly, once the KB
+        is known to be satisfiable. With the
+        incremental engine the remaining literals share one solver session: every
+        model found rules out the opposite answer for all pending literals,
+        so most literals are settled without a solver call of their own."""
+        if not STATS.enabled:
+            return self._ask_many(queries)
+        started = time.perf_counter()
+        answers = self._ask_many(queries)
+        STATS.record("kb.ask_many", time.perf_counter() - started)
+        return answers
+
+    def _ask_many(self, queries: List[Any]) -> List[Optional[bool]]:
+        queries = [Expr.create_expression(q) if isinstance(q, str) else q for q in queries]
+        self.queries += len(queries)
+        if not self.satisfiable():  # An inconsistent KB entails everything
+            return [True] * len(queries)
+        answers: List[Optional[bool]] = [None] * len(queries)
+
+        pending = {}  # index -> literal
+        for i, query in enumerate(queries):
+            literal = self.literal(query)
+            known = self.facts.value(literal) if literal is not None else None
+            if known is not None:
+                answers[i] = known
+                if STATS.enabled:
+                    STATS.count("facts.hits")
+            elif literal is not None and self.incremental:
+                pending[i] = literal
+            elif self.entails(query):
+                answers[i] = True
+            elif self.entails(~query):
+                answers[i] = False
+        if not pending:
+            return answers
+
+        # The KB is satisfiable, so only the part connected to the literals matters
+        solver = self.incremental_solver()
+        variables = self.component_variables(pending.values())
+        if not self.solve(solver, variables=variables):
+            for i in pending:  # An inconsistent KB entails everything
+                answers[i] = True
+            return answers
+
+        # Each literal may only be entailed with the value it has in the model
+        model = solver.model()
+        candidates = {}
+        for i, literal in pending.items():
+            value = model.get(abs(literal))
+            if value is not None:
+                candidates[i] = literal if value == (literal > 0) else -literal
+
+        while candidates:
+            i, candidate = candidates.popitem()
+            if not self.solve(solver, [-candidate], variables):
+                answers[i] = candidate == pending[i]
+                continue
+            model = solver.model()
+            for j, other in list(candidates.items()):
+                if model.get(abs(other)) != (other > 0):
+                    del candidates[j]
+        return answers
+
+    def stats(self) -> Dict[str, int]:
+        """Returns the size of the KB and the number of queries asked."""
+        return {
+            "clauses": len(self.store),
+            "symbols": len(self.store.symbols),
+            "facts": len(self.facts),
+            "learnt_clauses": len(self._solver.learnts) if self._solver is not None else 0,
+            "queries": self.queries,
+        }
+
+    def save(self, path: str) -> None:
+        """Saves the clauses, symbols and facts of the KB to a binary snapshot,
+        with the subformulas its auxiliary symbols name, so that a loaded KB
+        can retract sentences told with `tseitin`."""
+        with open(path, "wb") as file:
+            write_snapshot(self.store, self.facts, file, self.logic.cnf)
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = True, **options) -> "KnowledgeBase":
+        """Creates a KB from a snapshot written by `save`, with the given
+        constructor options. With `use_mmap` the file is memory-mapped
+        read-only and the stored clauses are read from it in place, so
+        processes loading the same snapshot share one copy of them."""
+        kb = cls(**options)
+        with open(path, "rb") as file:
+            buffer = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) if use_mmap else file.read()
+        read_snapshot(buffer, kb.store, kb.facts, kb.logic.cnf)
+        kb._unchecked = None
+        return kb
+
+    def literal(self, query: "Expr") -> Optional[int]:
+        """Returns the integer literal of a query that is a proposition symbol
+        or its negation, or None for any other query and for symbols the KB
+        does not mention."""
+        negated = query.op == "~"
+        symbol = query.args[0] if negated else query
+        if symbol.args or not self.logic.is_prop_symbol(symbol.op):
+            return None
+        var = self.store.symbols.get(symbol)
+        if var is None:
+            return None
+        return -var if negated else var
+
+    @property
+    def clauses(self) -> List[Expr]:
+        """The clauses of the KB as expressions."""
+        return [self.store.decode(clause) for clause in self.store]
+
     def tell(self, sentence: "Expr") -> None:
         """Adds clauses of a sentence to the KB."""
-        cnf_sentence = Logic().to_cnf(sentence)
-        conjuncts = Logic().conjuncts(cnf_sentence)
-        self.clauses.extend(conjuncts)
+        for clause in self.logic.conjuncts(self.logic.to_cnf(sentence, self.tseitin)):
+            literals = self.store.encode(clause)
+            if literals is not None:
+                self.add_clause(literals)
+
+    def tell_clause(self, clause: Iterable["Expr"]) -> None:
+        """Adds a clause given as its literals, skipping parsing and CNF
+        conversion."""
+        literals = self.store.encode_literals(clause)
+        if literals is not None:
+            self.add_clause(literals)
+
+    def tell_many(self, sentences: Iterable[Union[str, "Expr", Sequence["Expr"]]]) -> None:
+        """Adds a batch of sentences to the KB. Items may be sentences (strings
+        or expressions), which are converted to CNF, or clauses already given
+        as sequences of literals, which are added as they are. Duplicates are
+        dropped and the fact cache and solver are updated once per batch."""
+        batch = []
+        for sentence in sentences:
+            if isinstance(sentence, (tuple, list)):
+                batch.append(self.store.encode_literals(sentence))
+                continue
+            if isinstance(sentence, str):
+                sentence = Expr.create_expression(sentence)
+            for clause in self.logic.conjuncts(self.logic.to_cnf(sentence, self.tseitin)):
+                batch.append(self.store.encode(clause))
 
+        cids = self.store.add_many(literals for literals in batch if literals is not None)
+        self.facts.add_clauses(cids)
+        for cid in cids:
+            self._told(self.store.clause(cid))
+        if self._solver is not None:
+            for cid in cids:
+                self._solver.add_clause(self.store.clause(cid))
+
+    def add_clause(self, literals: array) -> None:
+        """Adds an encoded clause, updating the fact cache and the solver."""
+        cid = self.store.add(literals)
+        if cid is None:
+            return
+        self.facts.add_clause(cid)
+        self._told(literals)
+        if self._solver is not None:
+            self._solver.add_clause(literals)
+
+    def _told(self, literals: Sequence[int]) -> None:
+        # A satisfiable KB stays so unless the clauses around a new one conflict
+        if self._satisfiable and self._unchecked is not None:
+            self._unchecked.update(abs(lit) for lit in literals)
+
+    def satisfiable(self) -> bool:
+        """Is the KB satisfiable? The answer is kept until clauses are told or
+        retracted. After a tell only the clauses connected to the new ones
+        are solved again, since the rest was satisfiable already. Retracting
+        keeps a satisfiable KB satisfiable, so the whole KB is only checked
+        again after a retract from an unsatisfiable one."""
+        if self._unchecked is None or (self._unchecked and self._satisfiable):
+            if self.facts.is_consistent():
+                seeds = range(1, len(self.store.symbols) + 1) if self._unchecked is None else self._unchecked
+                solver = CDCLSolver()
+                for literals in self.renumber(self.store.component(seeds, self.facts.known(), keep_seeds=False)):
+                    solver.add_clause(literals)
+                self._satisfiable = self.solve(solver)
+            else:  # Unit propagation found a conflict
+                self._satisfiable = False
+            self._unchecked = set()
+        return self._satisfiable
 
     def ask_generator(self, query: "Expr") -> Generator[dict, None, None]:
         """Yields an empty substitution if the KB implies the query."""
-        if self.logic.tt_entails(Expr("&", *self.clauses), query):
+        literal = self.literal(query)
+        if not self.satisfiable():  # An inconsistent KB entails everything
+            known = True
+        else:
+            known = self.facts.value(literal) if literal is not None else None
+        if known is not None:
+            entailed = known
+        elif self.incremental:
+            entailed = self.sat_entails(query)
+        else:
+            entailed = self.local_entails(query)
+        if entailed:
             yield {}
 
-    def retract(self, sentence: "Expr") -> None:
-        """Removes clauses of a sentence from the KB."""
-        
-        for clause in self.logic.conjuncts(self.logic.to_cnf(sentence)):
-            if clause in self.clauses:
-                self.clauses.remove(clause)
+    def sat_entails(self, query: "Expr") -> bool:
+        """Does the KB entail the query? Checks that KB & ~query is unsatisfiable."""
+        scratch: Dict[Expr, int] = {}  # Symbols only the query mentions
+        negated_query = []
+        for clause in self.logic.conjuncts(self.logic.to_cnf(~query)):
+            literals = self.store.encode(clause, scratch=scratch)
+            if literals is not None:
+                negated_query.append(literals)
+
+        # The KB is satisfiable, so only the part connected to the query matters
+        solver = self.incremental_solver()
+        variables = self.component_variables(lit for literals in negated_query for lit in literals)
+        if len(negated_query) == 1 and len(negated_query[0]) == 1:
+            return not self.solve(solver, negated_query[0], variables)
+
+        # Guard ~query with a selector so it can be removed afterwards. Like the
+        # query's own symbols, it takes a temporary id past the symbol table
+        selector = len(self.store.symbols) + len(scratch) + 1
+        guarded = [[-selector, *literals] for literals in negated_query]
+        learnts = len(solver.learnts)
+        for clause in guarded:
+            solver.add_clause(clause)
+        entailed = not self.solve(solver, [selector], variables | {selector})
+        solver.release(guarded, [selector, *scratch.values()], learnts)
+        return entailed
+
+    def local_entails(self, query: "Expr") -> bool:
+        """Does the KB entail the query? Only the clauses connected to the query
+        are handed to the engine, simplified by the known facts."""
+        facts = self.facts.known()
+        scratch: Dict[Expr, int] = {}  # Symbols only the query mentions
+        negated_query = []
+        for clause in self.logic.conjuncts(self.logic.to_cnf(~query)):
+            literals = self.store.encode(clause, scratch=scratch)
+            if literals is None or any(lit in facts for lit in literals):
+                continue
+            negated_query.append([lit for lit in literals if -lit not in facts])
 
+        seeds = {abs(lit) for literals in negated_query for lit in literals}
+        clauses = self.store.component(seeds, facts)
+
+        if self.engine == "tt":
+            kb = self.logic.associate("&", [self.store.decode(clause) for clause in clauses])
+            alpha = ~self.logic.associate("&", [self.store.decode(clause, scratch) for clause in negated_query])
+            return self.logic.tt_entails(kb, alpha)
+        if self.engine == "vtt":
+            entailed = self._truth_table.entails_clauses(clauses, negated_query)
+            if entailed is not None:
+                return entailed
+
+        solver = SOLVERS.get(self.engine, CDCLSolver)()
+        for literals in self.renumber(clauses + negated_query):
+            solver.add_clause(literals)
+        return not self.solve(solver)
+
+    def component_variables(self, literals: Iterable[int]) -> Set[int]:
+        """Returns the variables of some literals and of the KB clauses
+        connected to them (see ClauseStore.component)."""
+        variables = {abs(lit) for lit in literals}
+        for clause in self.store.component(variables, self.facts.known()):
+            variables.update(abs(lit) for lit in clause)
+        return variables
+
+    @staticmethod
+    def renumber(clauses: List[Sequence[int]]) -> List[List[int]]:
+        """Numbers the variables of some clauses from 1 in order of appearance,
+        so that a solver given a small part of the KB does not size its
+        state by the store's symbol ids."""
+        numbers: Dict[int, int] = {}
+        renumbered = []
+        for clause in clauses:
+            literals = []
+            for lit in clause:
+                var = numbers.setdefault(abs(lit), len(numbers) + 1)
+                literals.append(var if lit > 0 else -var)
+            renumbered.append(literals)
+        return renumbered
+
+    @staticmethod
+    def solve(solver, assumptions: Sequence[int] = (), variables: Optional[Set[int]] = None) -> bool:
+        """Runs a solver, recording its time, decisions and conflicts in the
+        stats when they are enabled. `variables` restricts the branching of a
+        CDCL solver."""
+        options = {"variables": variables} if variables is not None else {}
+        if not STATS.enabled:
+            return solver.solve(assumptions, **options) if assumptions or options else solver.solve()
+        started = time.perf_counter()
+        decisions, conflicts = solver.decisions, getattr(solver, "conflicts", 0)
+        satisfiable = solver.solve(assumptions, **options) if assumptions or options else solver.solve()
+        STATS.record("solver", time.perf_counter() - started)
+        STATS.count("solver.decisions", solver.decisions - decisions)
+        STATS.count("solver.conflicts", getattr(solver, "conflicts", 0) - conflicts)
+        return satisfiable
+
+    def incremental_solver(self) -> CDCLSolver:
+        """Returns the persistent solver, loading the KB into it if needed."""
+        if self._solver is None:
+            self._solver = CDCLSolver()
+            for clause in self.store:
+                self._solver.add_clause(clause)
+        return self._solver
+
+    def retract(self, sentence: "Expr") -> None:
+        """Removes clauses of a sentence from the KB. A clause that was also told
+        by another sentence stays until that sentence is retracted too."""
+        for clause in self.logic.conjuncts(self.logic.to_cnf(sentence, self.tseitin)):
+            literals = self.store.encode(clause, intern=False)
+            if literals is not None and self.store.remove(literals) is not None:
+                self.facts.remove_clause(literals)
+                if not self._satisfiable:
+                    self._unchecked = None
+                if self._solver is not None:
+                    self._solver.remove_clause(literals)
@@ -1,6 +1,27 @@
 from collections import deque
-from typing import List, Optional
+from typing import Dict, List, Optional, Tuple
+from cnf import CNFConverter
 from expression import Expr
+from stats import STATS
+
+class CompiledCNF:
+    """A CNF sentence compiled for fast evaluation over bit-vector models.
+
+    Symbol `index[s]` is bit `index[s]` of a model given as an int. Each
+    clause is a pair of masks of its positive and its negated literals, so it
+    holds in `model` when `model & pos` or `~model & neg` is non-zero."""
+
+    def __init__(self, clauses: List[Tuple[int, int]], index: Dict[Expr, int]):
+        self.clauses = clauses
+        self.index = index
+
+    def evaluate(self, model: int) -> bool:
+        """Returns True if every clause holds in the model."""
+        for pos, neg in self.clauses:
+            if not (model & pos or ~model & neg):
+                return False
+        return True
+
 
 class Logic:
     """A class for logical operations and conversions."""
@@ -8,6 +29,10 @@ class Logic:
     TRUE, FALSE, ZERO, ONE, TWO = map(Expr, ["TRUE", "FALSE", 0, 1, 2])
     A, B, C, D, E, F, G, P, Q, x, y, z = map(Expr, "ABCDEFGPQxyz")
     _op_identity = {"&": TRUE, "|": FALSE, "+": ZERO, "*": ONE}
+    cnf = CNFConverter()  # Shared, so every Logic reuses the conversion cache
+
+    def __init__(self):
+        self._compiled_kb: Optional[Tuple[Expr, CompiledCNF]] = None
 
     def is_var_symbol(self, s: str) -> bool:
         """Returns True if the string is a variable symbol."""
@@ -36,7 +61,45 @@ class Logic:
         kb's and sentences."""
         # print("TT_ENTAILS", kb, alpha)
         assert not self.variables(alpha)
-        return self.tt_check_all(kb, alpha, self.prop_symbols(kb & alpha), {})
+
+        # The compiled kb is kept so that asking several queries reuses it
+        if self._compiled_kb is None or self._compiled_kb[0] is not kb:
+            self._compiled_kb = (kb, self.compile(kb))
+        compiled_kb = self._compiled_kb[1]
+        compiled_alpha = self.compile(alpha, dict(compiled_kb.index))
+
+        models = 1 << len(compiled_alpha.index)
+        for model in range(models):
+            if compiled_kb.evaluate(model) and not compiled_alpha.evaluate(model):
+                if STATS.enabled:
+                    STATS.count("tt.models", model + 1)
+                return False
+        if STATS.enabled:
+            STATS.count("tt.models", models)
+        return True
+
+    def compile(self, s: "Expr", index: Optional[Dict[Expr, int]] = None) -> CompiledCNF:
+        """Converts a sentence to CNF and compiles it into clause bit masks.
+        New symbols are numbered after the ones already in `index`."""
+        index = {} if index is None else index
+        clauses = []
+        for clause in self.conjuncts(self.to_cnf(s)):
+            pos = neg = 0
+            for literal in self.disjuncts(clause):
+                negated = literal.op == "~"
+                symbol = literal.args[0] if negated else literal
+                if symbol in (self.TRUE, self.FALSE):
+                    if negated == (symbol == self.FALSE):
+                        break  # The clause is always true
+                    continue
+                bit = 1 << index.setdefault(symbol, len(index))
+                if negated:
+                    neg |= bit
+                else:
+                    pos |= bit
+            else:
+                clauses.append((pos, neg))
+        return CompiledCNF(clauses, index)
 
     def tt_check_all(
         self, kb: "Expr", alpha: "Expr", symbols: deque, model: dict
@@ -62,6 +125,7 @@ class Logic:
             model[P] = False
             result_false = self.tt_check_all(kb, alpha, rest, model)
             del model[P]
+            symbols.appendleft(P)
             return result_true and result_false
 
     def prop_symbols(self, x: "Expr") -> deque:
@@ -115,10 +179,16 @@ class Logic:
         # Split the expression into a list of clauses
         p, q = args
         
-        if op == ">>": # implication
-            return self.evaluate(~p | q, model)
-        elif op == "<<": # reverse implication
-            return self.evaluate(p | ~q, model)
+        if op in (">>", "<<"): # implication, evaluated as ~p | q
+            if op == "<<":
+                p, q = q, p
+            pt = self.evaluate(p, model)
+            if pt is False:
+                return True
+            qt = self.evaluate(q, model)
+            if qt is True:
+                return True
+            return None if pt is None or qt is None else False
         
         # If the operator is not an implication, evaluate the expression
         # Get the truth values of the two propositions
@@ -126,7 +196,7 @@ class Logic:
         qt = self.evaluate(q, model) 
         
         # If the truth values are not known, return None
-        if not pt or not qt:
+        if pt is None or qt is None:
             return None
         
         # Evaluate the expression
@@ -137,73 +207,26 @@ class Logic:
         else:
             raise ValueError("illegal operator in logic expression" + str(exp))
 
-    def to_cnf(self, s: "Expr") -> "Expr":
-        """Converts a propositional logical sentence s to conjunctive normal form."""
+    def to_cnf(self, s: "Expr", tseitin: bool = False) -> "Expr":
+        """Converts a propositional logical sentence s to conjunctive normal form.
+        With `tseitin`, compound subformulas are replaced by auxiliary symbols
+        so the result is linear in the size of s (and only equisatisfiable)."""
         if isinstance(s, str):
             s = Expr.create_expression(s)
-        s = self.eliminate_implications(s)
-        s = self.demorgans_law(s)
-        return self.distribute_and_over_or(s)
+        return self.cnf.convert(s, tseitin)
 
     def eliminate_implications(self, s: "Expr") -> "Expr":
         """Change >>, <<, and <=> into &, |, and ~."""
-        if not s.args or Expr.is_symbol(s.op):
-            return s
-        args = list(map(self.eliminate_implications, s.args))
-        a, b = args[0], args[-1]
-        if s.op == ">>":
-            return b | ~a
-        elif s.op == "<<":
-            return a | ~b
-        elif s.op == "<=>":
-            return (a | ~b) & (b | ~a)
-        elif s.op == "^":
-            assert len(args) == 2
-            return (a & ~b) | (~a & b)
-        else:
-            assert s.op in ("&", "|", "~")
-            return Expr(s.op, *args)
+        return self.cnf.eliminate_implications(s)
     
     def demorgans_law(self, s: "Expr") -> "Expr":
         """Rewrite sentence s by moving negation sign inward."""
-        if s.op == "~":
-            NOT = lambda b: self.demorgans_law(~b)
-            a = s.args[0]
-            if a.op == "~":
-                return self.demorgans_law(a.args[0])
-            if a.op == "&":
-                return self.associate("|", map(NOT, a.args))
-            if a.op == "|":
-                return self.associate("&", map(NOT, a.args))
-            return s
-        elif Expr.is_symbol(s.op) or not s.args:
-            return s
-        else:
-            return Expr(s.op, *map(self.demorgans_law, s.args))
+        return self.cnf.negation_normal_form(s)
 
     def distribute_and_over_or(self, s: "Expr") -> "Expr":
         """Given a sentence s consisting of conjunctions and disjunctions of literals,
         return an equivalent sentence in CNF."""
-        if s.op == "|":
-            s = self.associate("|", s.args)
-            if s.op != "|":
-                return self.distribute_and_over_or(s)
-            if len(s.args) == 0:
-                return self.FALSE
-            if len(s.args) == 1:
-                return self.distribute_and_over_or(s.args[0])
-            conj = next((d for d in s.args if d.op == "&"), None)
-            if not conj:
-                return s
-            others = [a for a in s.args if a is not conj]
-            rest = self.associate("|", others)
-            return self.associate(
-                "&", [self.distribute_and_over_or(c | rest) for c in conj.args]
-            )
-        elif s.op == "&":
-            return self.associate("&", map(self.distribute_and_over_or, s.args))
-        else:
-            return s
+        return self.cnf.to_expr(self.cnf.distribute(self.cnf.negation_normal_form(s)))
 
     def associate(self, op: str, args: List["Expr"]) -> "Expr":
         """Given an associative op, return an expression with the same meaning as
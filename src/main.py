@@ -1,8 +1,10 @@
-from agent import WumpusAgent
-from environment import Environment
+from action import Action
+from runner import run_episode
 
 class Utils:
     def get_position_string(self, action):
+        if isinstance(action, Action):
+            return action.position
         actions = action.split("|")
         position_string = actions[1].strip() # (x, y)
         positions = position_string.split(",") # ['(x', 'y)']
@@ -11,6 +13,8 @@ class Utils:
         return x, y
 
     def get_last_action(self, action):
+        if isinstance(action, Action):
+            return action.kind.value
         actions = action.split("|")
         actions = actions[0].split("(")
         return actions[1].strip()
@@ -38,7 +42,7 @@ class Utils:
                 S = or_clause((i, j), "S", "W", world.get_nearby_cells((i, j)))
                 nS = and_clause((i, j), "~S", "~W", world.get_nearby_cells((i, j)))
                 
-                initial_clauses = initial_clauses + [B, nB, S, nS]
+                initial_clauses.extend([B, nB, S, nS])
         
         return initial_clauses
 
@@ -46,62 +50,10 @@ class Utils:
 def main():
     # CONSTANTS
     MAP_SIZE = 4
-    start_player_position = (MAP_SIZE - 1, 0)
-    utils = Utils()
     
-    # Create the world and the agent
-    world = Environment(grid_size=MAP_SIZE, player_position=start_player_position)
-    agent = WumpusAgent(start_player_position)
-    
-    # Define the initial clauses
-    start_clauses = utils.define_starting_clauses(world)
-    for clause in start_clauses:
-        agent.KB.tell(clause)
-        
-    print(start_clauses)
-
-    # Perceive
-    percept = world.get_percept(agent.position)
-    print(percept)
-    # print(agent.KB.clauses)
-    world.print_map(agent.position)
-
-    # Lets play
-    for _ in range(50):
-        # Act
-        action = agent.act(percept)
-        print(action)
-        
-        # If there is a "position" in the action, we can extract it as its going to be "... position (x, y)..."
-        x, y = utils.get_position_string(action)
-        last_action = utils.get_last_action(action)
-        print(last_action)
-        
-        # Perceive
-        percept = world.get_percept(agent.position)
-        print(percept)
-        # print(agent.KB.clauses)
-        world.print_map(agent.position)
-        
-        if last_action == "Climb":
-            print("Game Over, you have climbed out of the cave")
-            break
-        elif last_action == "Grab":
-            print("Gold has been grabbed")
-            world.remove_gold()
-        
-        # Check if player is located at a pit or wumpus
-        if world.is_valid_position((x, y)) and (world.is_pit((x, y)) or world.is_wumpus((x, y))):
-            if world.is_pit((x, y)):
-                print("Fell into a pit")
-            else:
-                print("Wumpus killed you")
-            agent.is_alive = False
-            print("Game over")
-            break
-        
-        print("-----------------")
-        # self.map = 
+    # Play one game, printing the map, percepts and actions every step
+    result = run_episode(grid_size=MAP_SIZE, max_steps=50, verbose=True)
+    print(f"Game over: {result.outcome}, score {result.score} after {result.steps} steps")
         
 
 if __name__ == "__main__":
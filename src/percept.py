@@ -0,0 +1,23 @@
+from enum import IntFlag
+from typing import List, Optional
+
+class Percept(IntFlag):
+    """What the agent senses in a cell, as bit flags that combine with `|`
+    and are tested with `in` (e.g. `Percept.BREEZE in percept`)."""
+    NONE = 0
+    STENCH = 1
+    BREEZE = 2
+    GLITTER = 4
+    BUMP = 8
+    SCREAM = 16
+
+    def as_list(self) -> List[Optional[str]]:
+        """The percept in the classic form [Stench, Breeze, Glitter, Bump,
+        Scream], with None for the senses that are absent."""
+        return [flag.name.capitalize() if self & flag else None for flag in SENSES]
+
+    def __str__(self) -> str:
+        return str(self.as_list())
+
+
+SENSES = (Percept.STENCH, Percept.BREEZE, Percept.GLITTER, Percept.BUMP, Percept.SCREAM)
@@ -0,0 +1,93 @@
+import heapq
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+Cell = Tuple[int, int]
+
+class Planner:
+    """Plans routes through the cells known to be safe.
+
+    A route may start and end anywhere, but every cell in between must be
+    safe. Routes found by `path` only depend on the safe set, so they are
+    cached until it grows. With a grid size, routes stay inside the grid.
+    """
+
+    DELTAS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+
+    def __init__(self, grid_size: Optional[int] = None):
+        self.grid_size = grid_size
+        self.safe: Set[Cell] = set()
+        self._paths: Dict[Tuple[Cell, Cell], Optional[List[Cell]]] = {}
+
+    def add_safe(self, cells: Iterable[Cell]) -> bool:
+        """Adds cells to the safe set. Returns True if it grew."""
+        new = set(cells) - self.safe
+        if new:
+            self.safe |= new
+            self._paths.clear()
+        return bool(new)
+
+    def neighbors(self, cell: Cell) -> List[Cell]:
+        x, y = cell
+        size = self.grid_size
+        return [(x + dx, y + dy) for dx, dy in self.DELTAS
+                if 0 <= x + dx and 0 <= y + dy and (size is None or (x + dx < size and y + dy < size))]
+
+    def path(self, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+        """Returns the shortest route from start to goal (without start), or
+        None if there is none, using A* with the Manhattan distance."""
+        key = (start, goal)
+        if key not in self._paths:
+            self._paths[key] = self._search(start, goal)
+        path = self._paths[key]
+        return None if path is None else list(path)
+
+    def _search(self, start: Cell, goal: Cell) -> Optional[List[Cell]]:
+        def distance(cell: Cell) -> int:
+            return abs(cell[0] - goal[0]) + abs(cell[1] - goal[1])
+
+        parents: Dict[Cell, Optional[Cell]] = {start: None}
+        costs = {start: 0}
+        queue = [(distance(start), start)]
+        while queue:
+            _, cell = heapq.heappop(queue)
+            if cell == goal:
+                return self._route(parents, goal)
+            for neighbor in self.neighbors(cell):
+                if neighbor != goal and neighbor not in self.safe:
+                    continue
+                cost = costs[cell] + 1
+                if cost < costs.get(neighbor, cost + 1):
+                    costs[neighbor] = cost
+                    parents[neighbor] = cell
+                    heapq.heappush(queue, (cost + distance(neighbor), neighbor))
+        return None
+
+    def nearest(self, start: Cell, targets: Iterable[Cell]) -> Optional[List[Cell]]:
+        """Returns the route from start to the closest target (the smallest one
+        on ties), or None if no target can be reached. Searches breadth-first."""
+        targets = set(targets)
+        parents: Dict[Cell, Optional[Cell]] = {start: None}
+        layer = [start]
+        while layer:
+            reached = [cell for cell in layer if cell in targets]
+            if reached:
+                return self._route(parents, min(reached))
+            following = []
+            for cell in layer:
+                if cell != start and cell not in self.safe:
+                    continue
+                for neighbor in self.neighbors(cell):
+                    if neighbor not in parents and (neighbor in self.safe or neighbor in targets):
+                        parents[neighbor] = cell
+                        following.append(neighbor)
+            layer = following
+        return None
+
+    @staticmethod
+    def _route(parents: Dict[Cell, Optional[Cell]], goal: Cell) -> List[Cell]:
+        route = []
+        cell = goal
+        while parents[cell] is not None:
+            route.append(cell)
+            cell = parents[cell]
+        return route[::-1]
@@ -0,0 +1,185 @@
+import random
+import re
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+from expression import Expr
+
+Cell = Tuple[int, int]
+Group = Tuple[List[int], List[Tuple[int, ...]]]
+
+class RiskEstimator:
+    """Estimates the probability that cells hold a pit or the wumpus, given
+    what a KB knows.
+
+    Hazards of each kind are taken as independent with a prior probability
+    per cell. The wumpus prior defaults to one wumpus among the n*n - 1 cells
+    of the grid other than the start. The evidence about them are the KB clauses that, once
+    simplified by the known facts, only mention hazards of that kind (like
+    P0_1 | P1_0 for a breezy cell), and the probability of a cell is the
+    weighted share of the models of the clauses connected to it in which it
+    holds the hazard. Groups of up to `max_exact` connected hazards are
+    enumerated; larger ones are sampled until `samples` models are accepted
+    or the time budget of the call runs out. Results are cached by the
+    clauses of the group.
+    """
+
+    def __init__(self, grid_size: int = 4, pit_prior: float = 0.2, wumpus_prior: Optional[float] = None,
+                 max_exact: int = 12, samples: int = 2000, time_budget: float = 0.05, seed: Optional[int] = 0,
+                 cache_size: int = 4096):
+        if wumpus_prior is None:
+            wumpus_prior = 1 / max(1, grid_size * grid_size - 1)
+        self.priors = {"P": pit_prior, "W": wumpus_prior}
+        self.max_exact = max_exact
+        self.samples = samples
+        self.time_budget = time_budget
+        self.cache_size = cache_size
+        self.random = random.Random(seed)
+        self._cache: Dict[tuple, Dict[int, float]] = {}
+
+    def risks(self, kb, cells: Iterable[Cell]) -> Dict[Cell, float]:
+        """Returns the probability that each cell holds a pit or the wumpus."""
+        cells = list(cells)
+        deadline = time.perf_counter() + self.time_budget
+        pits = self.probabilities(kb, "P", cells, deadline)
+        wumpus = self.probabilities(kb, "W", cells, deadline)
+        return {cell: 1 - (1 - pits[cell]) * (1 - wumpus[cell]) for cell in cells}
+
+    def probabilities(self, kb, kind: str, cells: List[Cell], deadline: float) -> Dict[Cell, float]:
+        """Returns the probability that each cell holds a hazard of the kind
+        ("P" or "W")."""
+        prior = self.priors[kind]
+        facts = kb.facts.known()
+        consistent = kb.satisfiable()
+        variables = {(x, y): kb.literal(Expr(f"{kind}{x}_{y}")) for x, y in cells}
+
+        result = {}
+        pending = []
+        for cell, var in variables.items():
+            if var in facts or not consistent:
+                result[cell] = 1.0
+            elif var is None:  # The KB says nothing about the cell
+                result[cell] = prior
+            elif -var in facts:
+                result[cell] = 0.0
+            else:
+                pending.append(var)
+
+        marginals: Dict[int, float] = {}
+        for group in self.groups(kb.store, kind, pending, facts):
+            marginals.update(self.count(group, prior, deadline))
+        for cell, var in variables.items():
+            result.setdefault(cell, marginals.get(var, prior))
+        return result
+
+    @staticmethod
+    def groups(store, kind: str, seeds: List[int], facts) -> List[Group]:
+        """Returns the connected groups of simplified clauses over hazards of
+        the kind that contain the seed variables."""
+        pattern = re.compile(rf"{kind}\d+_\d+")
+        kinds: Dict[int, bool] = {}
+
+        def is_hazard(var: int) -> bool:
+            if var not in kinds:
+                symbol = store.symbols.symbol(var)
+                kinds[var] = symbol is not None and not symbol.args and pattern.fullmatch(symbol.op) is not None
+            return kinds[var]
+
+        seen_vars, seen_clauses = set(), set()
+        groups = []
+        for seed in seeds:
+            if seed in seen_vars:
+                continue
+            seen_vars.add(seed)
+            variables, clauses = [seed], []
+            stack = [seed]
+            while stack:
+                var = stack.pop()
+                for cid in store.occurrences.get(var, set()) | store.occurrences.get(-var, set()):
+                    if cid in seen_clauses:
+                        continue
+                    seen_clauses.add(cid)
+                    clause = store.clause(cid)
+                    if any(lit in facts for lit in clause):
+                        continue
+                    residual = tuple(lit for lit in clause if -lit not in facts)
+                    if not all(is_hazard(abs(lit)) for lit in residual):
+                        continue
+                    clauses.append(residual)
+                    for lit in residual:
+                        if abs(lit) not in seen_vars:
+                            seen_vars.add(abs(lit))
+                            variables.append(abs(lit))
+                            stack.append(abs(lit))
+            groups.append((variables, clauses))
+        return groups
+
+    def count(self, group: Group, prior: float, deadline: float) -> Dict[int, float]:
+        """Returns the probability of a hazard at each variable of the group."""
+        variables, clauses = group
+        if not clauses:
+            return {var: prior for var in variables}
+        key = (prior, frozenset(clauses))
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        bits = {var: i for i, var in enumerate(sorted(variables))}
+        masks = []
+        for clause in clauses:
+            pos = neg = 0
+            for lit in clause:
+                if lit > 0:
+                    pos |= 1 << bits[lit]
+                else:
+                    neg |= 1 << bits[-lit]
+            masks.append((pos, neg))
+
+        n = len(bits)
+        if n <= self.max_exact:
+            weights = self.exact(masks, n, prior)
+        else:
+            weights = self.sample(masks, n, prior, deadline)
+            if weights is None:
+                return {var: prior for var in variables}
+
+        total = weights[n]
+        marginals = {var: weights[i] / total for var, i in bits.items()}
+        if len(self._cache) >= self.cache_size:
+            del self._cache[next(iter(self._cache))]  # Drop the oldest entry
+        self._cache[key] = marginals
+        return marginals
+
+    @staticmethod
+    def exact(masks: List[Tuple[int, int]], n: int, prior: float) -> List[float]:
+        """Sums the prior weight of the models of the clauses. Returns the sum
+        over the models where each bit is set, followed by the total."""
+        by_hazards = [prior ** k * (1 - prior) ** (n - k) for k in range(n + 1)]
+        weights = [0.0] * (n + 1)
+        for model in range(1 << n):
+            if all(model & pos or ~model & neg for pos, neg in masks):
+                weight = by_hazards[bin(model).count("1")]
+                weights[n] += weight
+                for i in range(n):
+                    if model >> i & 1:
+                        weights[i] += weight
+        return weights
+
+    def sample(self, masks: List[Tuple[int, int]], n: int, prior: float, deadline: float) -> Optional[List[float]]:
+        """Like `exact`, counting models drawn from the prior that satisfy
+        the clauses. Returns None if no model was accepted in time."""
+        weights = [0.0] * (n + 1)
+        draws = 0
+        while weights[n] < self.samples:
+            draws += 1
+            if draws % 64 == 0 and time.perf_counter() > deadline:
+                break
+            model = 0
+            for i in range(n):
+                if self.random.random() < prior:
+                    model |= 1 << i
+            if all(model & pos or ~model & neg for pos, neg in masks):
+                weights[n] += 1
+                for i in range(n):
+                    if model >> i & 1:
+                        weights[i] += 1
+        return weights if weights[n] else None
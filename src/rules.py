@@ -0,0 +1,42 @@
+from functools import lru_cache
+from typing import Iterator, Tuple
+from expression import Expr
+
+Clause = Tuple[Expr, ...]
+
+class WumpusRules:
+    """The breeze/pit and stench/wumpus rules of a square world, generated
+    directly as clauses.
+
+    For every cell with neighbors n1..nk the rules B <=> (P_n1 | ... | P_nk)
+    and S <=> (W_n1 | ... | W_nk) become the clauses (~B | P_n1 | ... | P_nk)
+    and (B | ~P_ni) for each neighbor, and the same for S and W. Clauses are
+    built once per grid size and cached.
+    """
+
+    DELTAS = [(0, 1), (1, 0), (0, -1), (-1, 0)]
+    RULES = [("B", "P"), ("S", "W")]
+
+    def __init__(self, grid_size: int):
+        self.grid_size = grid_size
+
+    def clauses(self) -> Iterator[Clause]:
+        """Yields the rule clauses as tuples of literals."""
+        yield from self.compile(self.grid_size)
+
+    @staticmethod
+    @lru_cache(maxsize=8)
+    def compile(grid_size: int) -> Tuple[Clause, ...]:
+        clauses = []
+        for x in range(grid_size):
+            for y in range(grid_size):
+                neighbors = [
+                    (x + dx, y + dy) for dx, dy in WumpusRules.DELTAS
+                    if 0 <= x + dx < grid_size and 0 <= y + dy < grid_size
+                ]
+                for percept, cause in WumpusRules.RULES:
+                    symbol = Expr(f"{percept}{x}_{y}")
+                    causes = [Expr(f"{cause}{nx}_{ny}") for nx, ny in neighbors]
+                    clauses.append((~symbol, *causes))
+                    clauses.extend((symbol, ~c) for c in causes)
+        return tuple(clauses)
@@ -0,0 +1,181 @@
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import numpy as np
+from action import Action, ActionType
+from agent import WumpusAgent
+from environment import Environment
+from knowledgebase import KnowledgeBase
+from percept import Percept
+from rules import WumpusRules
+
+class EpisodeResult(NamedTuple):
+    seed: Optional[int]
+    grid_size: int
+    outcome: str  # "won", "escaped" (climbed without the gold), "dead" or "timeout"
+    score: int
+    steps: int
+    queries: int
+    reasoning_time: float  # Seconds spent inside the agent
+
+
+# Scores of the classic Wumpus world
+ACTION_COST, GOLD_REWARD, DEATH_PENALTY = 1, 1000, 1000
+
+
+class Game:
+    """The referee of one episode: applies the agent's actions to a world
+    generated from the seed, keeps the score and decides the outcome."""
+
+    def __init__(self, seed: Optional[int] = None, grid_size: int = 4, max_steps: int = 50,
+                 pit_probability: float = 0.2):
+        self.seed = seed
+        self.grid_size = grid_size
+        self.max_steps = max_steps
+        self.start = (grid_size - 1, 0)
+        self.world = Environment(grid_size, self.start, pit_probability, rng=np.random.default_rng(seed))
+        self.position = self.start
+        self.has_gold = False
+        self.outcome: Optional[str] = None
+        self.score = 0
+        self.steps = 0
+        self.percept = self.world.get_percept(self.start)
+
+    @property
+    def done(self) -> bool:
+        return self.outcome is not None
+
+    def apply(self, action: Optional[Action]) -> Percept:
+        """Plays one action and returns what the agent perceives next. An agent
+        with no safe route left to take plays None, which ends the game."""
+        if action is None:
+            self.outcome = "timeout"
+            return self.percept
+        self.steps += 1
+        self.score -= ACTION_COST
+        self.position = action.position
+        if action.kind is ActionType.CLIMB:
+            self.outcome = "won" if self.has_gold else "escaped"
+            self.score += GOLD_REWARD if self.has_gold else 0
+        elif action.kind is ActionType.GRAB:
+            self.has_gold = True
+            self.world.remove_gold()
+        elif self.world.is_valid_position(self.position) and (
+                self.world.is_pit(self.position) or self.world.is_wumpus(self.position)):
+            self.outcome = "dead"
+            self.score -= DEATH_PENALTY
+        if self.outcome is None and self.steps >= self.max_steps:
+            self.outcome = "timeout"
+        self.percept = self.world.get_percept(self.position)
+        return self.percept
+
+    def result(self, queries: int, reasoning_time: float) -> EpisodeResult:
+        return EpisodeResult(self.seed, self.grid_size, self.outcome or "timeout", self.score, self.steps,
+                             queries, reasoning_time)
+
+
+def make_agent(grid_size: int, start: Tuple[int, int], engine: str = "cdcl", verbose: bool = False,
+               seed: Optional[int] = 0) -> WumpusAgent:
+    """Creates an agent at the start cell that knows the rules of the grid. The
+    seed drives the agent's own sampling."""
+    agent = WumpusAgent(start, verbose=verbose, grid_size=grid_size, seed=seed)
+    agent.KB = KnowledgeBase(engine=engine)
+    agent.KB.tell_many(WumpusRules(grid_size).clauses())
+    return agent
+
+
+def run_episode(seed: Optional[int] = None, grid_size: int = 4, max_steps: int = 50, pit_probability: float = 0.2,
+                engine: str = "cdcl", verbose: bool = False) -> EpisodeResult:
+    """Plays one game in a world generated from the seed. With `verbose` the
+    map, percepts and actions are printed every step."""
+    game = Game(seed, grid_size, max_steps, pit_probability)
+    agent = make_agent(grid_size, game.start, engine, verbose, seed)
+    if verbose:
+        print(game.percept)
+        game.world.print_map(agent.position)
+
+    reasoning_time = 0.0
+    while not game.done:
+        started = time.perf_counter()
+        action = agent.act(game.percept)
+        reasoning_time += time.perf_counter() - started
+        game.apply(action)
+        if verbose:
+            print(action)
+            print(game.percept)
+            game.world.print_map(agent.position)
+            print("-----------------")
+            if game.outcome == "dead":
+                print("Fell into a pit" if game.world.is_pit(game.position) else "Wumpus killed you")
+    if game.outcome == "dead":
+        agent.is_alive = False
+
+    return game.result(agent.KB.queries, reasoning_time)
+
+
+def run_episodes(seeds: Iterable[int], workers: Optional[int] = None, **options) -> List[EpisodeResult]:
+    """Plays one game per seed across a pool of processes (one per core by
+    default; with a single worker the games run in this process). Options are
+    passed to `run_episode`. Results are in the order of the seeds."""
+    seeds = list(seeds)
+    play = partial(run_episode, **options)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(seeds) <= 1:
+        return [play(seed) for seed in seeds]
+    chunksize = max(1, len(seeds) // (workers * 4))
+    with ProcessPoolExecutor(workers) as pool:
+        return list(pool.map(play, seeds, chunksize=chunksize))
+
+
+def summarize(results: List[EpisodeResult], elapsed: Optional[float] = None) -> Dict[str, float]:
+    """Aggregates episode results: outcome rates, means and, given the wall
+    time, episode and step throughput."""
+    count = len(results)
+    summary = {"episodes": count}
+    for outcome in ("won", "escaped", "dead", "timeout"):
+        summary[f"{outcome}_rate"] = sum(r.outcome == outcome for r in results) / count
+    for field in ("score", "steps", "queries", "reasoning_time"):
+        summary[f"mean_{field}"] = sum(getattr(r, field) for r in results) / count
+    if elapsed:
+        summary["episodes_per_second"] = count / elapsed
+        summary["steps_per_second"] = sum(r.steps for r in results) / elapsed
+    return summary
+
+
+def format_table(results: List[EpisodeResult]) -> str:
+    """Formats results as a text table with one row per episode."""
+    rows = [EpisodeResult._fields] + [
+        tuple(f"{value:.4f}" if isinstance(value, float) else str(value) for value in result)
+        for result in results
+    ]
+    widths = [max(len(row[i]) for row in rows) for i in range(len(EpisodeResult._fields))]
+    return "\n".join("  ".join(cell.rjust(width) for cell, width in zip(row, widths)) for row in rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Play Wumpus world games headlessly.")
+    parser.add_argument("--episodes", type=int, default=100)
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=200, help="step limit per episode")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first episode")
+    parser.add_argument("--pits", type=float, default=0.2, help="pit probability")
+    parser.add_argument("--engine", choices=KnowledgeBase.ENGINES, default="cdcl")
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--table", action="store_true", help="print every episode")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    results = run_episodes(range(args.seed, args.seed + args.episodes), args.workers, grid_size=args.size,
+                           max_steps=args.steps, pit_probability=args.pits, engine=args.engine)
+    elapsed = time.perf_counter() - started
+    if args.table:
+        print(format_table(results))
+    for key, value in summarize(results, elapsed).items():
+        print(f"{key}: {value:.4g}")
+
+
+if __name__ == "__main__":
+    main()
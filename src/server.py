@@ -0,0 +1,376 @@
+import argparse
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Deque, Dict, List, Optional, Set, Tuple
+from action import Action
+from agent import WumpusAgent
+from benchmark import percentile
+from knowledgebase import KnowledgeBase
+from percept import Percept
+from runner import EpisodeResult, Game, make_agent, summarize
+
+# Agents of the sessions hosted by this process, by session id
+_AGENTS: Dict[int, WumpusAgent] = {}
+
+
+def _start_agent(session: int, grid_size: int, start: Tuple[int, int], engine: str, seed: Optional[int]) -> None:
+    _AGENTS[session] = make_agent(grid_size, start, engine, seed=seed)
+
+
+def _act(session: int, percept: int) -> Tuple[Action, int, float]:
+    """Plays one turn of a session's agent. Returns its action, the queries
+    its KB has answered so far and the seconds the turn took."""
+    agent = _AGENTS[session]
+    started = time.perf_counter()
+    action = agent.act(Percept(percept))
+    return action, agent.KB.queries, time.perf_counter() - started
+
+
+def _stop_agent(session: int) -> None:
+    _AGENTS.pop(session, None)
+
+
+class ServerError(Exception):
+    """An error reported by the game server in reply to a request."""
+
+
+def latency_summary(samples: List[float]) -> Dict[str, float]:
+    """Returns the count, mean, percentiles and maximum of step latencies
+    (seconds)."""
+    if not samples:
+        return {"steps": 0}
+    return {
+        "steps": len(samples),
+        "mean": sum(samples) / len(samples),
+        "p50": percentile(samples, 50),
+        "p90": percentile(samples, 90),
+        "p99": percentile(samples, 99),
+        "max": max(samples),
+    }
+
+
+class Session:
+    """A game hosted by the server, whose agent lives on one shard."""
+
+    def __init__(self, id: int, game: Game, shard: int):
+        self.id = id
+        self.game = game
+        self.shard = shard
+        self.active = True  # Whether the agent is still held by its shard
+        self.lock = asyncio.Lock()  # Steps of a session run one at a time
+        self.latencies: List[float] = []
+        self.queries = 0
+        self.reasoning_time = 0.0
+
+    def result(self) -> EpisodeResult:
+        return self.game.result(self.queries, self.reasoning_time)
+
+
+class GameServer:
+    """Hosts many concurrent Wumpus games for clients speaking JSON lines.
+
+    Each request is a JSON object on one line with an "op" ("new", "step",
+    "close" or "stats") and its parameters, and gets one JSON line back with
+    "ok" and, on failure, "error" (an "id" in the request is echoed). The
+    worlds are refereed in the event loop, while the agents, whose KB
+    queries are the expensive part, run on `workers` shards: single-process
+    pools that keep the agents of their sessions between steps. A shard
+    whose process dies is replaced, and its sessions end. Sessions go to the
+    least loaded shard and are closed when the connection that created them
+    ends. The latency of every step, from the request to the reply, is
+    recorded.
+    """
+
+    def __init__(self, workers: Optional[int] = None, history: int = 10000):
+        workers = (os.cpu_count() or 1) if workers is None else workers
+        if workers < 1:
+            raise ValueError(f"A server needs at least one worker, got {workers}")
+        self.shards = [ProcessPoolExecutor(1) for _ in range(workers)]
+        self.loads = [0] * len(self.shards)  # Active sessions per shard
+        self.sessions: Dict[int, Session] = {}
+        self.games = 0  # Sessions created so far
+        self.steps = 0
+        self.latencies: Deque[float] = deque(maxlen=history)  # The most recent step latencies
+        self.handlers: Dict[str, Callable] = {
+            "new": self.new_session,
+            "step": self.step,
+            "close": self.close_session,
+            "stats": self.stats,
+        }
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765, path: Optional[str] = None) -> asyncio.AbstractServer:
+        """Starts listening on a TCP port, or on a Unix socket given its path."""
+        if path is not None:
+            return await asyncio.start_unix_server(self.serve_client, path)
+        return await asyncio.start_server(self.serve_client, host, port)
+
+    def close(self) -> None:
+        for shard in self.shards:
+            shard.shutdown(cancel_futures=True)
+
+    async def run(self, shard: int, function: Callable, *args: Any) -> Any:
+        executor = self.shards[shard]
+        try:
+            return await asyncio.get_running_loop().run_in_executor(executor, function, *args)
+        except BrokenProcessPool:
+            if self.shards[shard] is executor:  # Not replaced by another call yet
+                self.replace_shard(shard)
+            raise
+
+    def replace_shard(self, shard: int) -> None:
+        """Starts a new process for a shard whose process died. The agents of
+        its sessions died with it, so those sessions end."""
+        self.shards[shard].shutdown(wait=False, cancel_futures=True)
+        self.shards[shard] = ProcessPoolExecutor(1)
+        for session in self.sessions.values():
+            if session.shard == shard:
+                session.active = False
+        self.loads[shard] = 0
+
+    async def serve_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        owned: Set[int] = set()  # Sessions created by this connection
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                response = await self.respond(line, owned)
+                writer.write(json.dumps(response).encode() + b"\n")
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            return  # The server is shutting down, and its shards with it
+        finally:
+            writer.close()
+        for session in list(owned):
+            await self.close_session({"session": session}, owned)
+
+    async def respond(self, line: bytes, owned: Set[int]) -> Dict[str, Any]:
+        try:
+            request = json.loads(line)
+        except ValueError:
+            return {"ok": False, "error": "invalid JSON"}
+        if not isinstance(request, dict):
+            return {"ok": False, "error": "a request must be a JSON object"}
+
+        handler = self.handlers.get(request.get("op"))
+        if handler is None:
+            response = {"ok": False, "error": f"unknown op: {request.get('op')}"}
+        else:
+            try:
+                response = {"ok": True, **await handler(request, owned)}
+            except Exception as error:  # Report it to the client and keep serving
+                response = {"ok": False, "error": f"{type(error).__name__}: {error}"}
+        if "id" in request:
+            response["id"] = request["id"]
+        return response
+
+    def session(self, request: Dict[str, Any]) -> Session:
+        session = self.sessions.get(request.get("session"))
+        if session is None:
+            raise KeyError(f"no session {request.get('session')}")
+        return session
+
+    async def new_session(self, request: Dict[str, Any], owned: Set[int]) -> Dict[str, Any]:
+        """Creates a game. Takes the options of `run_episode`: seed,
+        grid_size, max_steps, pit_probability and engine."""
+        engine = request.get("engine", "cdcl")
+        if engine not in KnowledgeBase.ENGINES:
+            raise ValueError(f"Unknown entailment engine: {engine}")
+        game = Game(request.get("seed"), int(request.get("grid_size", 4)), int(request.get("max_steps", 50)),
+                    float(request.get("pit_probability", 0.2)))
+        self.games += 1
+        shard = self.loads.index(min(self.loads))
+        session = Session(self.games, game, shard)
+        self.loads[shard] += 1
+        try:
+            await self.run(shard, _start_agent, session.id, game.grid_size, game.start, engine, game.seed)
+        except BrokenProcessPool:
+            raise  # The load of the shard was reset when it was replaced
+        except BaseException:
+            self.loads[shard] -= 1
+            raise
+        self.sessions[session.id] = session
+        owned.add(session.id)
+        return {"session": session.id, "position": game.position, "percept": game.percept.as_list()}
+
+    async def step(self, request: Dict[str, Any], owned: Set[int]) -> Dict[str, Any]:
+        """Plays one turn: the agent acts on its percept and the world
+        answers with the next one."""
+        session = self.session(request)
+        game = session.game
+        started = time.perf_counter()
+        async with session.lock:
+            if game.done or not session.active:
+                raise ValueError(f"session {session.id} is over")
+            action, session.queries, reasoning_time = await self.run(session.shard, _act, session.id, int(game.percept))
+            session.reasoning_time += reasoning_time
+            game.apply(action)
+            if game.done:
+                await self.stop_agent(session)
+        latency = time.perf_counter() - started
+        session.latencies.append(latency)
+        self.latencies.append(latency)
+        self.steps += 1
+        return {
+            "session": session.id,
+            "action": str(action),
+            "position": game.position,
+            "percept": game.percept.as_list(),
+            "done": game.done,
+            "outcome": game.outcome,
+            "score": game.score,
+            "steps": game.steps,
+            "latency": latency,
+        }
+
+    async def close_session(self, request: Dict[str, Any], owned: Set[int]) -> Dict[str, Any]:
+        """Ends a game, returning its result and step latencies."""
+        session = self.session(request)
+        async with session.lock:
+            await self.stop_agent(session)
+        del self.sessions[session.id]
+        owned.discard(session.id)
+        return {"session": session.id, "result": session.result()._asdict(),
+                "latency": latency_summary(session.latencies)}
+
+    async def stop_agent(self, session: Session) -> None:
+        if session.active:
+            session.active = False
+            self.loads[session.shard] -= 1
+            try:
+                await self.run(session.shard, _stop_agent, session.id)
+            except BrokenProcessPool:
+                pass  # The agent died with its shard, which has been replaced
+
+    async def stats(self, request: Dict[str, Any], owned: Set[int]) -> Dict[str, Any]:
+        """Returns the step latencies of a session, or of the server (over
+        its most recent steps) when no session is given."""
+        if "session" in request:
+            session = self.session(request)
+            return {"session": session.id, "latency": latency_summary(session.latencies)}
+        return {
+            "sessions": len(self.sessions),
+            "games": self.games,
+            "steps": self.steps,
+            "shard_loads": self.loads,
+            "latency": latency_summary(list(self.latencies)),
+        }
+
+
+class Client:
+    """A client of the game server, sending one request at a time."""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+
+    @classmethod
+    async def connect(cls, host: str = "127.0.0.1", port: int = 8765, path: Optional[str] = None) -> "Client":
+        if path is not None:
+            return cls(*await asyncio.open_unix_connection(path))
+        return cls(*await asyncio.open_connection(host, port))
+
+    async def request(self, op: str, **params: Any) -> Dict[str, Any]:
+        """Sends a request and returns the reply. Raises ServerError if it failed."""
+        self.writer.write(json.dumps({"op": op, **params}).encode() + b"\n")
+        await self.writer.drain()
+        line = await self.reader.readline()
+        if not line:
+            raise ConnectionError("the server closed the connection")
+        response = json.loads(line)
+        if not response["ok"]:
+            raise ServerError(response["error"])
+        return response
+
+    async def play(self, **options: Any) -> Tuple[EpisodeResult, List[float]]:
+        """Plays a game to the end. Returns its result and the round-trip
+        time of every step."""
+        session = (await self.request("new", **options))["session"]
+        latencies = []
+        done = False
+        while not done:
+            started = time.perf_counter()
+            done = (await self.request("step", session=session))["done"]
+            latencies.append(time.perf_counter() - started)
+        result = (await self.request("close", session=session))["result"]
+        return EpisodeResult(**result), latencies
+
+    async def close(self) -> None:
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+async def load_test(clients: int = 10, games: int = 1, host: str = "127.0.0.1", port: int = 8765,
+                    path: Optional[str] = None, seed: int = 0, **options: Any) -> Tuple[List[EpisodeResult], Dict[str, float]]:
+    """Plays `games` games on each of `clients` concurrent connections, with
+    consecutive seeds. Options are passed to the "new" requests. Returns the
+    results, in the order of the seeds, and a summary with the throughput and
+    the round-trip step latencies."""
+    async def play(first: int) -> List[Tuple[EpisodeResult, List[float]]]:
+        client = await Client.connect(host, port, path)
+        try:
+            return [await client.play(seed=first + i, **options) for i in range(games)]
+        finally:
+            await client.close()
+
+    started = time.perf_counter()
+    played = [game for games_played in await asyncio.gather(*(play(seed + c * games) for c in range(clients)))
+              for game in games_played]
+    elapsed = time.perf_counter() - started
+
+    results = [result for result, _ in played]
+    summary = summarize(results, elapsed)
+    latency = latency_summary([step for _, latencies in played for step in latencies])
+    summary.update({f"step_{key}": value for key, value in latency.items() if key != "steps"})
+    return results, summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Wumpus world games over JSON lines, or load-test a server.")
+    parser.add_argument("command", choices=("serve", "load"))
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--unix", help="path of a Unix socket to use instead of TCP")
+    parser.add_argument("--workers", type=int, default=None, help="agent processes of the server")
+    parser.add_argument("--clients", type=int, default=10, help="concurrent connections of the load test")
+    parser.add_argument("--games", type=int, default=1, help="games per connection")
+    parser.add_argument("--size", type=int, default=4)
+    parser.add_argument("--steps", type=int, default=50, help="step limit per game")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the first game")
+    parser.add_argument("--pits", type=float, default=0.2, help="pit probability")
+    parser.add_argument("--engine", choices=KnowledgeBase.ENGINES, default="cdcl")
+    args = parser.parse_args()
+
+    async def serve():
+        server = GameServer(args.workers)
+        listener = await server.start(args.host, args.port, args.unix)
+        print(f"Serving on {args.unix or f'{args.host}:{args.port}'}")
+        try:
+            async with listener:
+                await listener.serve_forever()
+        finally:
+            server.close()
+
+    if args.command == "serve":
+        try:
+            asyncio.run(serve())
+        except KeyboardInterrupt:
+            pass
+        return
+
+    _, summary = asyncio.run(load_test(args.clients, args.games, args.host, args.port, args.unix, args.seed,
+                                       grid_size=args.size, max_steps=args.steps, pit_probability=args.pits,
+                                       engine=args.engine))
+    for key, value in summary.items():
+        print(f"{key}: {value:.4g}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+import re
+import struct
+import sys
+from array import array
+from typing import BinaryIO, Optional
+from clausestore import ClauseStore, OccurrenceIndex, PackedClauses
+from cnf import CNFConverter
+from facts import FactCache
+
+# A snapshot is a header followed by these sections, each padded to 8 bytes:
+#   names        UTF-8 symbol names by id from 1, "\n"-separated ("" for ids of no symbol)
+#   offsets      int64 x (clauses + 1), where each clause starts in `literals`
+#   counts       uint32 x clauses, their reference counts
+#   literals     int32, the literals of every clause one after another
+#   occurrences  int64 x (2 * symbols + 2), where the clause ids of each literal
+#                (from -symbols to symbols) start in `cids`
+#   cids         int32, the clauses of every literal one after another
+#   facts        int32, the unit propagation facts
+#   definitions  UTF-8 "<symbol> <op> <args>" lines, the subformulas named by the
+#                auxiliary symbols of the store (see CNFConverter.definitions)
+HEADER = struct.Struct("<4sHHQQQQQQ")  # magic, version, flags, symbols, clauses, literals, facts, names and
+                                       # definitions bytes
+MAGIC, VERSION = b"WKB\0", 2
+CONSISTENT = 1
+
+
+def write_snapshot(store: ClauseStore, facts: FactCache, file: BinaryIO, cnf: Optional[CNFConverter] = None) -> None:
+    """Writes the symbols, clauses and facts of a store to a binary file, and
+    the definitions of its auxiliary symbols kept by `cnf`."""
+    symbol_names = store.symbols.names()
+    names = "\n".join(symbol_names).encode()
+    n_symbols = len(store.symbols)
+    offsets, counts, literals = array("q", [0]), array("I"), array("i")
+    occurrences = [[] for _ in range(2 * n_symbols + 1)]
+    for cid, clause in enumerate(store):
+        literals.extend(clause)
+        offsets.append(len(literals))
+        counts.append(store.count(clause))
+        for lit in clause:
+            occurrences[lit + n_symbols].append(cid)
+
+    occurrence_offsets, cids = array("q", [0]), array("i")
+    for occurrence in occurrences:
+        cids.extend(occurrence)
+        occurrence_offsets.append(len(cids))
+    known = array("i", sorted(facts.known()))
+    flags = CONSISTENT if facts.consistent else 0
+
+    # The definitions of the store's symbols, and of the symbols they use
+    needed, lines = set(symbol_names), []
+    for name, op, args in reversed(cnf.definitions() if cnf is not None else []):
+        if name in needed:
+            needed.update(args)
+            lines.append(" ".join([name, op, *args]))
+    definitions = "\n".join(reversed(lines)).encode()
+
+    file.write(HEADER.pack(MAGIC, VERSION, flags, n_symbols, len(counts), len(literals), len(known), len(names),
+                           len(definitions)))
+    for section in (names, offsets, counts, literals, occurrence_offsets, cids, known, definitions):
+        data = section if isinstance(section, bytes) else section.tobytes()
+        file.write(data)
+        file.write(bytes(-len(data) % 8))
+
+
+def read_snapshot(buffer, store: ClauseStore, facts: FactCache, cnf: Optional[CNFConverter] = None) -> None:
+    """Restores a snapshot into an empty store and its fact cache, and the
+    definitions of its auxiliary symbols into `cnf`. Clauses, their counts
+    and the occurrence index are views of `buffer`, so a memory-mapped
+    snapshot is read in place rather than copied."""
+    if sys.byteorder != "little":
+        raise ValueError("Snapshots can only be read on little-endian machines")
+    view = memoryview(buffer)
+    magic, version = struct.unpack_from("<4sH", view)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a knowledge base snapshot of this version")
+    _, _, flags, n_symbols, n_clauses, n_literals, n_facts, n_names, n_definitions = HEADER.unpack_from(view)
+
+    position = HEADER.size
+
+    def section(size: int, typecode: str) -> memoryview:
+        nonlocal position
+        data = view[position:position + size]
+        position += size + (-size % 8)
+        return data.cast(typecode) if typecode else data
+
+    names = bytes(section(n_names, "")).decode().split("\n") if n_symbols else []
+    offsets = section(8 * (n_clauses + 1), "q")
+    counts = section(4 * n_clauses, "I")
+    literals = section(4 * n_literals, "i")
+    occurrence_offsets = section(8 * (2 * n_symbols + 2), "q")
+    cids = section(4 * occurrence_offsets[-1], "i")
+    known = section(4 * n_facts, "i")
+    definitions = [line.split(" ") for line in bytes(section(n_definitions, "")).decode().split("\n") if line]
+
+    auxiliary = [int(match.group(1)) for match in map(re.compile(r"Aux_(\d+)").fullmatch, names) if match]
+    if auxiliary:
+        CNFConverter.reserve_aux(max(auxiliary))
+    if cnf is not None and definitions:
+        # Symbols that already name other subformulas here are renamed
+        renamed = cnf.define([(name, op, args) for name, op, *args in definitions])
+        names = [renamed.get(name, name) for name in names]
+
+    store.restore(names, PackedClauses(offsets, literals), counts, OccurrenceIndex(occurrence_offsets, cids))
+    facts.restore(known, bool(flags & CONSISTENT))
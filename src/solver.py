@@ -0,0 +1,463 @@
+import heapq
+from typing import AbstractSet, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+# Clauses are lists of non-zero integers (DIMACS convention): variable v
+# appears as v when it is positive and as -v when it is negated.
+
+
+class DPLLSolver:
+    """Davis-Putnam-Logemann-Loveland search with unit propagation and pure
+    literal elimination. Kept as a simple reference for the CDCL solver."""
+
+    DECISION, FLIPPED, IMPLIED = range(3)
+
+    def __init__(self):
+        self.clauses: List[List[int]] = []
+        self.ok = True
+        self.decisions = 0
+
+    def add_clause(self, literals: Iterable[int]) -> bool:
+        """Adds a clause to the problem. Returns False if the problem became
+        trivially unsatisfiable."""
+        clause = sorted(set(literals))
+        if any(-lit in clause for lit in clause):  # Tautologies are always true
+            return self.ok
+        if not clause:
+            self.ok = False
+        else:
+            self.clauses.append(clause)
+        return self.ok
+
+    def solve(self) -> bool:
+        """Returns True if the clauses are satisfiable."""
+        if not self.ok:
+            return False
+
+        assignment: Dict[int, bool] = {}
+        trail = []  # (literal, kind) in assignment order
+        while True:
+            if self._simplify(assignment, trail):
+                # Conflict: undo up to the last decision that was not flipped yet
+                while trail:
+                    lit, kind = trail.pop()
+                    del assignment[abs(lit)]
+                    if kind == self.DECISION:
+                        trail.append((-lit, self.FLIPPED))
+                        assignment[abs(lit)] = -lit > 0
+                        break
+                else:
+                    return False
+                continue
+
+            lit = self._choose(assignment)
+            if lit is None:
+                return True
+            self.decisions += 1
+            trail.append((lit, self.DECISION))
+            assignment[abs(lit)] = lit > 0
+
+    def _simplify(self, assignment: dict, trail: list) -> bool:
+        """Applies unit propagation and pure literal elimination until nothing
+        changes. Returns True on conflict."""
+        changed = True
+        while changed:
+            changed = False
+            polarity: Dict[int, int] = {}
+            for clause in self.clauses:
+                unassigned = []
+                for lit in clause:
+                    value = assignment.get(abs(lit))
+                    if value is None:
+                        unassigned.append(lit)
+                    elif value == (lit > 0):
+                        break
+                else:
+                    if not unassigned:
+                        return True
+                    if len(unassigned) == 1:
+                        lit = unassigned[0]
+                        assignment[abs(lit)] = lit > 0
+                        trail.append((lit, self.IMPLIED))
+                        changed = True
+                        continue
+                    for lit in unassigned:
+                        polarity[abs(lit)] = polarity.get(abs(lit), 0) | (1 if lit > 0 else 2)
+            if changed:
+                continue
+            for var, seen in polarity.items():
+                if seen != 3 and var not in assignment:
+                    assignment[var] = seen == 1
+                    trail.append((var if seen == 1 else -var, self.IMPLIED))
+                    changed = True
+        return False
+
+    def _choose(self, assignment: dict) -> Optional[int]:
+        """Returns a literal from the first clause that is not satisfied yet."""
+        for clause in self.clauses:
+            if any(assignment.get(abs(lit)) == (lit > 0) for lit in clause):
+                continue
+            for lit in clause:
+                if abs(lit) not in assignment:
+                    return lit
+        return None
+
+
+class CDCLSolver:
+    """Conflict-driven clause learning solver with two watched literals,
+    first-UIP learning, non-chronological backjumping, activity-based
+    branching with phase saving, and geometric restarts.
+
+    Given clauses are kept as they were added, so they can be removed again:
+    the top-level assignments and learnt clauses that may depend on a removed
+    clause are then recomputed from the remaining ones. Only variables that
+    occur in a clause are branched on, so unused ids cost nothing."""
+
+    def __init__(self):
+        self.ok = True
+        self.num_vars = 0
+        self.clauses: Dict[Tuple[int, ...], List[int]] = {}  # Given clauses, by their sorted literals
+        self._units: Set[Tuple[int, ...]] = set()  # Given clauses with less than two literals
+        self._learnt = False  # Whether clauses (including units) were learnt since the last reset
+        self.learnts: List[List[int]] = []
+        self.decisions = 0
+        self.conflicts = 0
+
+        # Per variable state, indexed by variable (index 0 is unused)
+        self._values: List[int] = [0]  # 1 true, -1 false, 0 unassigned
+        self._levels: List[int] = [0]
+        self._reasons: List[Optional[List[int]]] = [None]
+        self._activity: List[float] = [0.0]
+        self._phase: List[int] = [-1]
+        self._occurrences: List[int] = [0]  # Given and learnt clauses the variable occurs in
+
+        self._watches: Dict[int, List[List[int]]] = {}
+        self._trail: List[int] = []
+        self._trail_lim: List[int] = []
+        self._qhead = 0
+        self._heap: List[tuple] = []
+        self._var_inc = 1.0
+        self._restart_limit = 100
+
+    def add_clause(self, literals: Iterable[int]) -> bool:
+        """Adds a clause to the problem. Returns False if the problem became
+        unsatisfiable at the top level."""
+        clause = set(literals)
+        for lit in clause:
+            self._ensure_var(abs(lit))
+        if any(-lit in clause for lit in clause):
+            return self.ok
+        key = tuple(sorted(clause))
+        if key in self.clauses:
+            return self.ok
+
+        clause = list(key)
+        self.clauses[key] = clause
+        self._occur(clause, 1)
+        if len(clause) < 2:
+            self._units.add(key)
+        self._cancel_until(0)
+        self._attach(clause)
+        return self.ok
+
+    def remove_clause(self, literals: Iterable[int]) -> bool:
+        """Removes a given clause. Returns False if it was not in the problem."""
+        key = tuple(sorted(set(literals)))
+        clause = self.clauses.pop(key, None)
+        if clause is None:
+            return False
+        self._cancel_until(0)
+        self._units.discard(key)
+        self._occur(clause, -1)
+        if len(clause) >= 2:
+            self._unwatch([clause])
+        # Nothing depends on a clause that is no reason for a top-level assignment,
+        # unless clauses were learnt from it
+        if len(clause) < 2 or not self.ok or self._learnt or any(self._reasons[abs(lit)] is clause for lit in self._trail):
+            self._reset()
+        return True
+
+    def release(self, clauses: Iterable[Iterable[int]], variables: Iterable[int], learnts: int = 0) -> None:
+        """Removes clauses that were guarded by assumptions on temporary
+        variables (like the selector of a query), with the clauses learnt
+        since `learnts` (a former length of `self.learnts`) that mention the
+        variables, and unassigns the variables so their ids can be reused.
+        As the guards are only ever assumed, none of these clauses implied
+        anything at the top level, so the rest of the state is kept."""
+        self._cancel_until(0)
+        variables = set(variables)
+        dropped = [self.clauses.pop(key) for key in {tuple(sorted(set(clause))) for clause in clauses}
+                   if key in self.clauses]
+        kept = []
+        for learnt in self.learnts[learnts:]:
+            (dropped if any(abs(lit) in variables for lit in learnt) else kept).append(learnt)
+        self.learnts[learnts:] = kept
+        self._unwatch(dropped)
+        for clause in dropped:
+            self._occur(clause, -1)
+
+        self._trail = [lit for lit in self._trail if abs(lit) not in variables]
+        self._qhead = len(self._trail)
+        for var in variables:
+            if var <= self.num_vars and self._values[var]:
+                self._values[var] = 0
+                self._reasons[var] = None
+                heapq.heappush(self._heap, (-self._activity[var], var))
+
+    def solve(self, assumptions: Sequence[int] = (), variables: Optional[AbstractSet[int]] = None) -> bool:
+        """Returns True if the clauses are satisfiable with every assumption
+        literal true. Assumptions hold for this call only, so the solver (and
+        the clauses it learnt) can be reused with different assumptions. On
+        success the satisfying assignment can be read with `model`.
+
+        With `variables` only those are branched on, and True means that they
+        were all assigned without a conflict. This decides the whole problem
+        when the clauses outside the ones over `variables` are known to be
+        satisfiable together with them, e.g. for the part of a satisfiable KB
+        connected to a query (see ClauseStore.component)."""
+        if not self.ok:
+            return False
+        self._cancel_until(0)
+        for lit in assumptions:
+            self._ensure_var(abs(lit))
+
+        conflicts_since_restart = 0
+        while True:
+            conflict = self._propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts_since_restart += 1
+                if not self._trail_lim:
+                    self.ok = False
+                    return False
+                learnt, level = self._analyze(conflict)
+                self._cancel_until(level)
+                self._learn(learnt)
+                self._var_inc /= 0.95
+                continue
+
+            if conflicts_since_restart >= self._restart_limit:
+                conflicts_since_restart = 0
+                self._restart_limit = int(self._restart_limit * 1.5)
+                self._cancel_until(0)
+                continue
+
+            # Each assumption gets its own decision level, before any real decision
+            level = len(self._trail_lim)
+            if level < len(assumptions):
+                lit = assumptions[level]
+                value = self._value(lit)
+                if value == -1:
+                    return False
+                self._trail_lim.append(len(self._trail))
+                if value == 0:
+                    self._enqueue(lit, None)
+                continue
+
+            var = self._pick_branch(variables)
+            if var is None:
+                return True
+            self.decisions += 1
+            self._trail_lim.append(len(self._trail))
+            self._enqueue(var if self._phase[var] > 0 else -var, None)
+
+    def model(self) -> Dict[int, bool]:
+        """Returns the assignment found by the last successful `solve`."""
+        return {var: self._values[var] > 0 for var in range(1, self.num_vars + 1) if self._values[var]}
+
+    def _ensure_var(self, var: int) -> None:
+        while self.num_vars < var:
+            self.num_vars += 1
+            self._values.append(0)
+            self._levels.append(0)
+            self._reasons.append(None)
+            self._activity.append(0.0)
+            self._phase.append(-1)
+            self._watches[self.num_vars] = []
+            self._watches[-self.num_vars] = []
+            self._occurrences.append(0)
+
+    def _occur(self, clause: List[int], delta: int) -> None:
+        """Counts a clause in (or out of) the occurrences of its variables. A
+        variable is only put on the branching heap once it occurs somewhere."""
+        for lit in clause:
+            var = abs(lit)
+            self._occurrences[var] += delta
+            if delta > 0 and self._occurrences[var] == delta and not self._values[var]:
+                heapq.heappush(self._heap, (-self._activity[var], var))
+
+    def _value(self, lit: int) -> int:
+        value = self._values[abs(lit)]
+        return value if lit > 0 else -value
+
+    def _watch(self, clause: List[int]) -> None:
+        self._watches[clause[0]].append(clause)
+        self._watches[clause[1]].append(clause)
+
+    def _attach(self, clause: List[int]) -> None:
+        """Watches a given clause at the top level, propagating it if it is unit."""
+        if len(clause) >= 2:
+            clause.sort(key=self._value, reverse=True)  # True literals first, false ones last
+            self._watch(clause)
+        if not self.ok:
+            return
+        first = self._value(clause[0]) if clause else -1
+        if first == -1:
+            self.ok = False
+        elif first == 0 and (len(clause) == 1 or self._value(clause[1]) == -1):
+            self._enqueue(clause[0], clause if len(clause) > 1 else None)
+            self.ok = self._propagate() is None
+
+    def _reset(self) -> None:
+        """Forgets the learnt clauses and the top-level assignments and
+        propagates the given unit clauses again."""
+        self._unwatch(self.learnts)
+        for clause in self.learnts:
+            self._occur(clause, -1)
+        self.learnts = []
+        self._learnt = False
+        for lit in self._trail:
+            var = abs(lit)
+            self._values[var] = 0
+            self._reasons[var] = None
+            heapq.heappush(self._heap, (-self._activity[var], var))
+        self._trail = []
+        self._qhead = 0
+        self.ok = True
+        for key in self._units:
+            self._attach(self.clauses[key])
+
+    def _unwatch(self, clauses: List[List[int]]) -> None:
+        dropped = {id(clause) for clause in clauses}
+        for lit in {lit for clause in clauses for lit in clause[:2]}:
+            self._watches[lit] = [clause for clause in self._watches[lit] if id(clause) not in dropped]
+
+    def _enqueue(self, lit: int, reason: Optional[List[int]]) -> None:
+        var = abs(lit)
+        self._values[var] = 1 if lit > 0 else -1
+        self._levels[var] = len(self._trail_lim)
+        self._reasons[var] = reason
+        self._trail.append(lit)
+
+    def _propagate(self) -> Optional[List[int]]:
+        """Propagates the pending assignments in the trail. Returns the
+        conflicting clause, if any."""
+        values = self._values
+        while self._qhead < len(self._trail):
+            false_lit = -self._trail[self._qhead]
+            self._qhead += 1
+            watchers = self._watches[false_lit]
+            kept = []
+            for i, clause in enumerate(watchers):
+                # Keep the falsified watch in the second position
+                if clause[0] == false_lit:
+                    clause[0], clause[1] = clause[1], clause[0]
+                first = clause[0]
+                first_value = values[abs(first)] if first > 0 else -values[abs(first)]
+                if first_value == 1:
+                    kept.append(clause)
+                    continue
+
+                # Look for a new literal to watch
+                for k in range(2, len(clause)):
+                    lit = clause[k]
+                    if (values[abs(lit)] if lit > 0 else -values[abs(lit)]) != -1:
+                        clause[1], clause[k] = lit, false_lit
+                        self._watches[lit].append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    if first_value == -1:
+                        kept.extend(watchers[i + 1:])
+                        self._watches[false_lit] = kept
+                        self._qhead = len(self._trail)
+                        return clause
+                    self._enqueue(first, clause)
+            self._watches[false_lit] = kept
+        return None
+
+    def _analyze(self, conflict: List[int]) -> tuple:
+        """Derives the first-UIP clause from a conflict. Returns the learnt
+        clause (asserting literal first) and the level to backjump to."""
+        seen = set()
+        learnt = [0]
+        level = len(self._trail_lim)
+        counter = 0
+        index = len(self._trail) - 1
+        clause = conflict
+        while True:
+            for q in clause:
+                var = abs(q)
+                if var in seen or self._levels[var] == 0:
+                    continue
+                seen.add(var)
+                self._bump(var)
+                if self._levels[var] >= level:
+                    counter += 1
+                else:
+                    learnt.append(q)
+
+            while abs(self._trail[index]) not in seen:
+                index -= 1
+            p = self._trail[index]
+            index -= 1
+            counter -= 1
+            if counter == 0:
+                break
+            clause = self._reasons[abs(p)]
+        learnt[0] = -p
+
+        if len(learnt) == 1:
+            return learnt, 0
+        # The literal with the highest level becomes the second watch
+        best = max(range(1, len(learnt)), key=lambda i: self._levels[abs(learnt[i])])
+        learnt[1], learnt[best] = learnt[best], learnt[1]
+        return learnt, self._levels[abs(learnt[1])]
+
+    def _learn(self, learnt: List[int]) -> None:
+        self._learnt = True
+        if len(learnt) == 1:
+            self._enqueue(learnt[0], None)
+        else:
+            self.learnts.append(learnt)
+            self._occur(learnt, 1)
+            self._watch(learnt)
+            self._enqueue(learnt[0], learnt)
+
+    def _bump(self, var: int) -> None:
+        self._activity[var] += self._var_inc
+        if self._activity[var] > 1e100:
+            self._activity = [a * 1e-100 for a in self._activity]
+            self._var_inc *= 1e-100
+            self._heap = [(-self._activity[v], v) for v in range(1, self.num_vars + 1)
+                          if not self._values[v] and self._occurrences[v]]
+            heapq.heapify(self._heap)
+        elif not self._values[var]:
+            heapq.heappush(self._heap, (-self._activity[var], var))
+
+    def _pick_branch(self, variables: Optional[AbstractSet[int]] = None) -> Optional[int]:
+        if variables is not None:
+            free = [var for var in variables if var <= self.num_vars and not self._values[var] and self._occurrences[var]]
+            return max(free, key=self._activity.__getitem__) if free else None
+        while self._heap:
+            _, var = heapq.heappop(self._heap)
+            if not self._values[var] and self._occurrences[var]:
+                return var
+        return None
+
+    def _cancel_until(self, level: int) -> None:
+        """Undoes every assignment made above the given decision level."""
+        if len(self._trail_lim) <= level:
+            return
+        start = self._trail_lim[level]
+        for lit in reversed(self._trail[start:]):
+            var = abs(lit)
+            self._phase[var] = self._values[var]
+            self._values[var] = 0
+            self._reasons[var] = None
+            heapq.heappush(self._heap, (-self._activity[var], var))
+        del self._trail[start:]
+        del self._trail_lim[level:]
+        self._qhead = len(self._trail)
+
+
+SOLVERS = {"dpll": DPLLSolver, "cdcl": CDCLSolver}
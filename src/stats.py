@@ -0,0 +1,80 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional
+
+class Stats:
+    """Counters and timers for the reasoning stack and the agent.
+
+    Disabled by default: instrumented code checks `enabled` before doing any
+    measuring, so that check is all it costs. Timed events are also passed to
+    the registered callbacks as (name, seconds).
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.counters: Dict[str, int] = {}
+        self.timers: Dict[str, List[float]] = {}  # name -> [count, total, max]
+        self.callbacks: List[Callable[[str, float], None]] = []
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def record(self, name: str, seconds: float) -> None:
+        """Adds a timed event."""
+        timer = self.timers.get(name)
+        if timer is None:
+            self.timers[name] = [1, seconds, seconds]
+        else:
+            timer[0] += 1
+            timer[1] += seconds
+            timer[2] = max(timer[2], seconds)
+        for callback in self.callbacks:
+            callback(name, seconds)
+
+    @contextmanager
+    def timer(self, name: str) -> Iterator[None]:
+        """Times the block as an event, if enabled."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def reset(self) -> None:
+        self.counters.clear()
+        self.timers.clear()
+
+    def snapshot(self) -> dict:
+        """Returns the counters and, for each timer, its event count and the
+        total, mean and maximum seconds."""
+        return {
+            "counters": dict(self.counters),
+            "timers": {
+                name: {"count": count, "total": total, "mean": total / count, "max": longest}
+                for name, (count, total, longest) in self.timers.items()
+            },
+        }
+
+
+STATS = Stats()
+
+
+@contextmanager
+def profile(callback: Optional[Callable[[str, float], None]] = None, reset: bool = True) -> Iterator[Stats]:
+    """Enables the stats for the block (reset first, unless `reset` is False)
+    and yields them. A callback receives every timed event meanwhile."""
+    previous = STATS.enabled
+    if reset:
+        STATS.reset()
+    if callback is not None:
+        STATS.callbacks.append(callback)
+    STATS.enabled = True
+    try:
+        yield STATS
+    finally:
+        STATS.enabled = previous
+        if callback is not None:
+            STATS.callbacks.remove(callback)
@@ -0,0 +1,107 @@
+import pytest
+from action import Action, ActionType
+from knowledgebase import KnowledgeBase
+from main import Utils
+from percept import Percept
+from planner import Planner
+from risk import RiskEstimator
+from rules import WumpusRules
+from runner import make_agent
+
+class TestAgent:
+    """Test the agent's bookkeeping, planning and risk estimates."""
+    def test_visited(self):
+        """Test that the agent's visited cells follow the L facts it tells."""
+        agent = make_agent(4, (0, 0))
+        agent.act(Percept.NONE)
+        agent.act(Percept.NONE)
+        
+        assert agent.visited == {(0, 0), (0, 1)}
+        for x, y in agent.visited:
+            assert agent.KB.ask(f"L{x}_{y}")
+        assert agent.frontier == {(1, 0), (0, 2), (1, 1)}
+        assert agent.unvisited((0, 1)) == {(0, 2), (1, 1)}
+        
+        # Cells past the far edges of the grid are not neighbors either
+        agent = make_agent(4, (3, 3))
+        agent.act(Percept.NONE)
+        assert agent.get_neighbors((3, 3)) == [(3, 2), (2, 3)]
+        assert all(0 <= x < 4 and 0 <= y < 4 for x, y in agent.frontier | agent.visited)
+        assert Planner(4).neighbors((3, 0)) == [(3, 1), (2, 0)]
+        
+        # A risky move never targets a cell off the map, which would only get the prior
+        agent = make_agent(4, (3, 0))
+        agent.act(Percept.BREEZE)
+        agent.frontier.add((4, 0))
+        ranked = []
+        risks = agent.risk.risks
+        agent.risk.risks = lambda kb, cells: ranked.extend(cells) or risks(kb, cells)
+        assert agent.plan_route(agent.position)[-1] == (3, 1) and (4, 0) not in ranked
+
+    
+    def test_planner(self):
+        """Test that routes only cross safe cells and follow the safe set."""
+        planner = Planner()
+        planner.add_safe([(0, 0), (0, 1), (0, 2), (1, 2), (2, 2), (2, 1)])
+        assert planner.path((0, 0), (2, 0)) == [(0, 1), (0, 2), (1, 2), (2, 2), (2, 1), (2, 0)]
+        assert planner.path((0, 0), (3, 3)) is None
+        assert planner.nearest((0, 0), {(1, 1), (3, 2), (5, 5)}) == [(0, 1), (1, 1)]
+        
+        assert not planner.add_safe([(0, 1)])
+        assert planner.add_safe([(1, 0)])
+        assert planner.path((0, 0), (2, 0)) == [(1, 0), (2, 0)]
+        
+        # The agent walks back to a safe frontier cell instead of giving up
+        agent = make_agent(4, (0, 0))
+        agent.act(Percept.NONE)
+        assert agent.position == (0, 1)
+        agent.act(Percept.BREEZE)
+        assert agent.position == (0, 0)
+        agent.act(Percept.NONE)
+        assert agent.position == (1, 0)
+        
+        # A route through a cell proven unsafe is dropped, and a goal with no route is not taken
+        agent.plan = [(1, 1), (2, 1)]
+        agent.unsafe.add((1, 1))
+        assert agent.get_next_cell(agent.position) != (1, 1)
+        assert agent.go_to((3, 3)) is None
+        assert agent.position == (1, 0)
+
+    
+    def test_risk(self):
+        """Test hazard probabilities against hand-computed ones."""
+        kb = KnowledgeBase()
+        kb.tell_many(WumpusRules(4).clauses())
+        kb.tell_many(["L0_0", "~P0_0", "~W0_0", "B0_0", "~S0_0"])
+        risks = RiskEstimator(pit_prior=0.2).risks(kb, [(0, 1), (1, 0), (2, 2)])
+        assert risks[(0, 1)] == pytest.approx(0.2 / (1 - 0.8 ** 2))
+        assert risks[(1, 0)] == risks[(0, 1)]
+        assert risks[(2, 2)] == pytest.approx(1 - 0.8 * (1 - 1 / 15))
+        assert RiskEstimator(6).priors["W"] == 1 / 35
+        
+        # Visiting (0, 1) proves the pit at (1, 0), and sampling agrees with the exact count
+        kb.tell_many(["L0_1", "~P0_1", "~W0_1", "B0_1", "~S0_1"])
+        exact = RiskEstimator().risks(kb, [(1, 0), (1, 1), (0, 2)])
+        sampled = RiskEstimator(max_exact=0, samples=20000, time_budget=10, seed=1).risks(kb, [(1, 0), (1, 1), (0, 2)])
+        assert exact[(1, 0)] == 1.0
+        assert exact[(1, 1)] == exact[(0, 2)] == pytest.approx(0.2 / (1 - 0.8 ** 2))
+        for cell in exact:
+            assert sampled[cell] == pytest.approx(exact[cell], abs=0.02)
+        
+        # Sampling with the same seed gives the same estimates
+        again = RiskEstimator(max_exact=0, samples=20000, time_budget=10, seed=1).risks(kb, [(1, 0), (1, 1), (0, 2)])
+        assert again == sampled
+
+    
+    def test_actions(self):
+        """Test that actions and percepts render as the classic strings."""
+        agent = make_agent(4, (0, 0))
+        action = agent.act(Percept.NONE)
+        assert action == Action(ActionType.FORWARD, (0, 1), 'NORTH', 1)
+        assert str(action) == "Executed(Forward| (0, 1)| NORTH| 1)"
+        assert Utils().get_position_string(action) == Utils().get_position_string(str(action)) == (0, 1)
+        assert Utils().get_last_action(action) == Utils().get_last_action(str(action)) == "Forward"
+        assert agent.act(Percept.GLITTER | Percept.BREEZE).kind is ActionType.GRAB
+        
+        assert str(Percept.STENCH | Percept.SCREAM) == str(['Stench', None, None, None, 'Scream'])
+        assert Percept.NONE.as_list() == [None] * 5
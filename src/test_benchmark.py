@@ -0,0 +1,16 @@
+from benchmark import Case, compare, measure, percentile
+
+class TestBenchmark:
+    """Test the benchmark statistics."""
+    def test_benchmark(self):
+        """Test the benchmark statistics and the baseline comparison."""
+        assert percentile([3, 1, 2, 4], 50) == 2 and percentile([3, 1, 2, 4], 99) == 4
+        assert percentile(list(range(1, 7)), 50) == 3 and percentile(list(range(1, 11)), 50) == 5
+        assert percentile([5, 1], 0) == 1 and percentile([5, 1], 100) == 5
+        result = measure(Case("sum", lambda: list(range(1000)), sum, 1000, 5))
+        assert result["runs"] == 5 and result["p50"] <= result["p99"]
+        assert result["ops_per_second"] > 0 and result["peak_bytes"] >= 0
+        
+        baseline = {"sum": dict(result, p50=result["p50"] / 2), "gone": result}
+        assert compare({"sum": result}, baseline, 0.5) == [f"sum: p50 {result['p50'] / 2:.4g} -> {result['p50']:.4g}"]
+        assert compare({"sum": result}, {"sum": result}, 0.0) == []
@@ -0,0 +1,48 @@
+import pytest
+from environment import EMPTY, GOLD, WUMPUS, Environment, WorldGenerator
+from percept import Percept
+
+class TestEnvironment:
+    """Test the Environment and the WorldGenerator."""
+    def test_environment(self):
+        """Test that the precomputed percepts match the neighboring cells."""
+        world = Environment(8, (7, 0))
+        assert world.is_wumpus(world.wumpus_position) and world.is_gold(world.gold_position)
+        assert not world.is_pit((7, 0)) and not world.is_wumpus((7, 0))
+        for x in range(8):
+            for y in range(8):
+                nearby = world.get_nearby_cells((x, y))
+                percept = world.get_percept((x, y))
+                assert (Percept.STENCH in percept) == any(world.is_wumpus(cell) for cell in nearby)
+                assert (Percept.BREEZE in percept) == any(world.is_pit(cell) for cell in nearby)
+                assert (Percept.GLITTER in percept) == world.is_gold((x, y))
+                assert Percept.BUMP not in percept and Percept.SCREAM not in percept
+        assert world.get_percept((8, 0)) == Percept.BUMP
+        
+        world.remove_wumpus()
+        world.remove_gold()
+        assert not world.stench.any() and not world.glitter.any()
+        assert Percept.SCREAM in world.get_percept((0, 0))
+
+    
+    def test_world_generator(self):
+        """Test that seeded batches are reproducible and well formed."""
+        grids = WorldGenerator(7).batch(50, 6, (5, 0))
+        assert grids.shape == (50, 6, 6)
+        assert (grids == WorldGenerator(7).batch(50, 6, (5, 0))).all()
+        assert ((grids == WUMPUS).sum(axis=(1, 2)) == 1).all()
+        assert ((grids == GOLD).sum(axis=(1, 2)) == 1).all()
+        assert (grids[:, 5, 0] == EMPTY).all()
+        
+        # The gold is next to the start, behind a calm cell, or walled in by pits
+        grid = [[0, 0, 0], [0, 0, 3], [2, 0, 0]]
+        assert WorldGenerator.is_solvable(grid, (0, 0)).tolist() == [True]
+        grid = [[0, 1, 0], [1, 0, 3], [2, 0, 0]]
+        assert WorldGenerator.is_solvable(grid, (0, 0)).tolist() == [False]
+        
+        solvable = WorldGenerator(7).batch(20, 6, (5, 0), solvable=True)
+        assert len(solvable) == 20 and WorldGenerator.is_solvable(solvable, (5, 0)).all()
+        with pytest.raises(ValueError):
+            WorldGenerator(7).batch(5, 6, (5, 0), pit_probability=1.0, solvable=True, max_attempts=3)
+        world = Environment(6, (5, 0), grid=solvable[0])
+        assert world.is_gold(world.gold_position) and world.is_wumpus_alive()
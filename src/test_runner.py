@@ -0,0 +1,22 @@
+import pytest
+from runner import Game, run_episodes, summarize
+
+class TestRunner:
+    """Test the headless episode runner."""
+    def test_runner(self):
+        """Test that parallel episodes match sequential ones."""
+        sequential = run_episodes(range(6), workers=1, grid_size=5, max_steps=100)
+        parallel = run_episodes(range(6), workers=2, grid_size=5, max_steps=100)
+        assert [r[:-1] for r in sequential] == [r[:-1] for r in parallel]
+        for result in sequential:
+            assert result.outcome in ("won", "escaped", "dead", "timeout")
+            assert result.queries > 0 and 0 < result.steps <= 100
+        
+        summary = summarize(sequential, elapsed=1.0)
+        assert summary["episodes"] == 6 and summary["steps_per_second"] == sum(r.steps for r in sequential)
+        assert sum(summary[f"{outcome}_rate"] for outcome in ("won", "escaped", "dead", "timeout")) == pytest.approx(1)
+        
+        # An agent left with no safe route ends the game
+        game = Game(seed=0)
+        game.apply(None)
+        assert game.done and game.result(0, 0.0).outcome == "timeout"
@@ -0,0 +1,70 @@
+import asyncio
+import os
+from concurrent.futures.process import BrokenProcessPool
+import pytest
+from runner import run_episode
+from server import Client, GameServer, ServerError, load_test
+
+class TestServer:
+    """Test the game server and its load-test client."""
+    def test_server(self, tmp_path):
+        """Test that served games play like headless ones and report latencies."""
+        path = str(tmp_path / "wumpus.sock")
+        
+        async def scenario():
+            server = GameServer(workers=1)
+            listener = await server.start(path=path)
+            try:
+                results, summary = await load_test(3, 2, path=path, seed=10, grid_size=4, max_steps=30)
+                client = await Client.connect(path=path)
+                first = await client.request("new", seed=10, grid_size=4, id=7)
+                assert first["id"] == 7 and first["position"] == [3, 0] and len(first["percept"]) == 5
+                step = await client.request("step", session=first["session"])
+                assert step["steps"] == 1 and step["action"].startswith("Executed(") and step["latency"] > 0
+                with pytest.raises(ServerError):
+                    await client.request("step", session=-1)
+                with pytest.raises(ServerError):
+                    await client.request("new", engine="magic")
+                stats = await client.request("stats")
+                await client.close()
+                await asyncio.sleep(0.1)  # Let the server close the abandoned session
+                return results, summary, stats, len(server.sessions)
+            finally:
+                listener.close()
+                await listener.wait_closed()
+                server.close()
+        
+        results, summary, stats, open_sessions = asyncio.run(scenario())
+        assert [r.seed for r in results] == list(range(10, 16))
+        for result in results:
+            expected = run_episode(result.seed, grid_size=4, max_steps=30)
+            assert result._replace(reasoning_time=0) == expected._replace(reasoning_time=0)
+        assert summary["episodes"] == 6 and summary["step_p50"] <= summary["step_max"]
+        assert stats["games"] == 7 and stats["sessions"] == 1 and stats["shard_loads"] == [1]
+        assert stats["steps"] == sum(r.steps for r in results) + 1 and stats["latency"]["p99"] > 0
+        assert open_sessions == 0
+
+    
+    def test_broken_shard(self):
+        """Test that a shard whose process dies is replaced and its sessions end."""
+        with pytest.raises(ValueError):
+            GameServer(workers=0)
+        
+        async def scenario():
+            server = GameServer(workers=1)
+            owned = set()
+            try:
+                lost = await server.new_session({"seed": 1}, owned)
+                with pytest.raises(BrokenProcessPool):
+                    await server.run(0, os._exit, 1)
+                with pytest.raises(ValueError):
+                    await server.step({"session": lost["session"]}, owned)
+                closed = await server.close_session({"session": lost["session"]}, owned)
+                session = await server.new_session({"seed": 2}, owned)
+                step = await server.step({"session": session["session"]}, owned)
+                return closed, step, list(server.loads)
+            finally:
+                server.close()
+        
+        closed, step, loads = asyncio.run(scenario())
+        assert closed["result"]["steps"] == 0 and step["steps"] == 1 and loads == [1]
@@ -0,0 +1,36 @@
+from expression import Expr
+from knowledgebase import KnowledgeBase
+from percept import Percept
+from runner import make_agent
+from stats import STATS, profile
+
+class TestStats:
+    """Test the counters and timers."""
+    def test_stats(self):
+        """Test that the stats are only collected inside a profile block."""
+        events = []
+        with profile(lambda name, seconds: events.append(name)) as stats:
+            kb = KnowledgeBase()
+            kb.tell("B0_0 <=> ( P0_1 | P1_0 ) & ~Q")
+            kb.tell("B0_0")
+            assert kb.ask("P0_1 | P1_0") and kb.ask_many(["P0_1", "Q"]) == [None, False]
+            kb.logic.tt_entails(Expr.create_expression("A & B"), Expr.create_expression("A"))
+            snapshot = stats.snapshot()
+        
+        counters, timers = snapshot["counters"], snapshot["timers"]
+        assert counters["tt.models"] == 4 and counters["facts.hits"] == 1
+        assert counters["solver.decisions"] >= 0 and timers["solver"]["count"] >= 2
+        assert timers["kb.ask"]["count"] == 1 and timers["kb.ask_many"]["count"] == 1
+        assert timers["parse"]["count"] >= 3 and timers["cnf"]["count"] >= 1
+        assert set(events) == set(timers)
+        assert kb.stats() == {"clauses": 5, "symbols": 4, "facts": 2, "learnt_clauses": 0, "queries": 3}
+        
+        assert not STATS.enabled and not STATS.callbacks
+        kb.ask("P0_1")
+        assert stats.snapshot() == snapshot
+        
+        with profile():
+            agent = make_agent(4, (0, 0))
+            agent.act(Percept.NONE)
+        assert len(agent.turns) == 1 and agent.turns[0]["queries"] > 0
+        assert agent.turns[0]["total"] >= agent.turns[0]["tell"] + agent.turns[0]["plan"]
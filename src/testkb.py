@@ -1,4 +1,14 @@
+from itertools import count
+from cnf import CNFConverter
+from expression import Expr
 from knowledgebase import KnowledgeBase
+from logic import Logic
+from main import Utils
+from solver import CDCLSolver
+from environment import Environment
+from rules import WumpusRules
+import gc
+import pickle
 import pytest
 
 class TestKnowledgeBase:
@@ -61,6 +71,313 @@ class TestKnowledgeBase:
         ans = kb.ask("L1_0")
         print(ans, ans == True)
         
+    def test_sat_engines(self):
+        """Test that the SAT engines prove entailment by refutation."""
+        for engine in ("cdcl", "dpll", "tt", "vtt"):
+            kb = KnowledgeBase(engine=engine)
+            kb.tell("B0_0 <=> ( P0_1 | P1_0 )")
+            kb.tell("B1_1 <=> ( P1_0 | P0_1 )")
+            kb.tell("~B0_0")
+            kb.tell("B0_1 ==> W1_1")
+            
+            assert kb.ask("~P0_1")
+            assert kb.ask("~P1_0")
+            assert kb.ask("~B1_1")
+            assert not kb.ask("W1_1")
+            assert not kb.ask("~W1_1")
+            assert kb.ask("B0_1 ==> W1_1")
+            assert kb.ask("~P0_1 & ~P1_0")
+        
+        with pytest.raises(ValueError):
+            KnowledgeBase(engine="magic")
+        
+        # The CDCL solver only branches on variables that occur in a clause
+        solver = CDCLSolver()
+        solver.add_clause([4000, -3999])
+        assert solver.solve() and solver.decisions <= 2
+        solver.remove_clause([4000, -3999])
+        solver.add_clause([1, 2])
+        assert solver.solve() and set(solver.model()) == {1, 2}
+    
+    def test_clause_store(self):
+        """Test that clauses are interned, deduplicated and retracted."""
+        kb = KnowledgeBase()
+        kb.tell("B0_0 <=> ( P0_1 | P1_0 )")
+        kb.tell("~B0_0 <=> ( ~P0_1 & ~P1_0 )")
+        assert len(kb.store) == 3
+        assert len(kb.store.symbols) == 3
+        
+        b00 = kb.store.symbols.get(Expr.create_expression("B0_0"))
+        assert len(kb.store.occurrences[b00]) == 2
+        
+        kb.tell("P0_1")
+        assert kb.ask("B0_0")
+        kb.retract("P0_1")
+        assert not kb.ask("B0_0")
+        assert len(kb.store) == 3
+    
+    def test_incremental(self):
+        """Test that the persistent solver follows tell and retract."""
+        kb = KnowledgeBase()
+        batch = KnowledgeBase(incremental=False)
+        sentences = ["B0_0 <=> ( P0_1 | P1_0 )", "B1_1 <=> ( P1_0 | P0_1 )", "~B0_0", "P1_1 | P0_1"]
+        queries = ["P0_1", "~P1_0", "B1_1", "P1_1", "P1_1 & ~B1_1", "P1_0 | P1_1"]
+        
+        for sentence in sentences:
+            kb.tell(sentence)
+            batch.tell(sentence)
+            for query in queries:
+                assert kb.ask(query) == batch.ask(query)
+        assert kb.ask("P1_1") and kb.ask("~B1_1")
+        
+        # Queries leave the KB and the solver as they were, even with unknown symbols
+        symbols, clauses = len(kb.store.symbols), len(kb._solver.clauses)
+        for _ in range(10):
+            assert kb.ask("P1_1 & ~B1_1") and not kb.ask("P1_0 | Z9_9") and kb.ask("Z9_9 | ~Z9_9")
+            assert not kb.ask("Z9_9") and kb.ask_many(["Z9_9", "P1_1"]) == [None, True]
+        assert len(kb.store.symbols) == symbols and len(kb._solver.clauses) == clauses
+        assert kb._solver.num_vars <= symbols + 2
+        
+        # Retracting edits the solver in place, undoing what followed from the clause
+        solver = kb._solver
+        kb.retract("~B0_0")
+        assert not kb.ask("P1_1") and not kb.ask("~P0_1") and kb.ask("P1_1 | P0_1")
+        kb.tell("~B0_0")
+        assert kb.ask("P1_1") and kb.ask("~P0_1 & ~P1_0")
+        kb.retract("P1_1 | P0_1")
+        assert not kb.ask("P1_1") and kb.ask("~P0_1")
+        assert kb._solver is solver and kb._solver.ok
+        
+        # Queries only branch on the part of the KB connected to them, not the whole grid
+        kb = KnowledgeBase()
+        kb.tell_many(WumpusRules(16).clauses())
+        kb.tell_many(["L0_0", "~P0_0", "~W0_0", "B0_0", "~S0_0"])
+        assert kb.ask_many(["P0_1", "~W1_0", "P5_5"]) == [None, True, None]
+        assert not kb.ask("P0_1 | P5_5") and kb.ask("P0_1 | P1_0")
+        assert kb._solver.decisions < 20
+    
+    def test_ask_many(self):
+        """Test that batched queries agree with single asks."""
+        for engine in ("cdcl", "dpll"):
+            kb = KnowledgeBase(engine=engine)
+            for sentence in ["B0_0 <=> ( P0_1 | P1_0 )", "B1_1 <=> ( P1_0 | P0_1 )", "~B0_0", "P1_1 | W1_1", "L0_0"]:
+                kb.tell(sentence)
+            
+            answers = kb.ask_many(["P0_1", "~P1_0", "B1_1", "P1_1", "W1_1", "L0_0", "~L0_0", "L9_9", "P1_1 | W1_1"])
+            assert answers == [False, True, False, None, None, True, False, None, True]
+    
+    def test_fact_cache(self):
+        """Test that unit propagation facts follow tell and retract."""
+        kb = KnowledgeBase()
+        kb.tell("B0_0 <=> ( P0_1 | P1_0 )")
+        kb.tell("P1_0 | P1_1")
+        kb.tell("~B0_0")
+        
+        p11 = kb.literal(Expr.create_expression("P1_1"))
+        assert kb.facts.value(kb.literal(Expr.create_expression("~P0_1"))) is True
+        assert kb.facts.value(p11) is True
+        assert kb.ask("P1_1")
+        
+        kb.retract("~B0_0")
+        assert kb.facts.value(p11) is None
+        assert not kb.ask("P1_1")
+        
+        kb.tell("~P1_1")
+        kb.tell("B0_0 ==> P1_1")
+        assert not kb.facts.consistent
+        assert kb.ask("W0_0")
+        
+        # A contradiction that propagation misses still entails everything
+        for options in ({}, {"incremental": False}, {"tseitin": True}, {"engine": "tt"}):
+            kb = KnowledgeBase(**options)
+            kb.tell_many(["A | B", "A | ~B", "~A | B", "~A | ~B", "~C"])
+            assert kb.facts.consistent and not kb.satisfiable()
+            assert kb.ask("C") and kb.ask_many(["C", "D"]) == [True, True]
+            kb.retract("~A | ~B")
+            assert kb.satisfiable() and not kb.ask("C") and kb.ask_many(["C", "A"]) == [False, True]
+    
+    def test_query_component(self):
+        """Test that non-incremental engines only see clauses near the query."""
+        kb = KnowledgeBase(engine="tt", incremental=False)
+        for sentence in ["B0_0 <=> ( P0_1 | P1_0 )", "B1_0 <=> ( P0_0 | P1_1 | P2_0 )",
+                         "B2_0 <=> ( P1_0 | P2_1 )", "B0_1 <=> ( P0_0 | P1_1 | P0_2 )", "~P0_0", "B0_0"]:
+            kb.tell(sentence)
+        
+        p01 = kb.literal(Expr.create_expression("P0_1"))
+        component = kb.store.component({p01}, kb.facts.known())
+        # B1_0, B2_0 and B0_1 are unknown, so their definitions are dropped
+        unknown = {kb.literal(Expr.create_expression(s)) for s in ["B1_0", "B2_0", "B0_1"]}
+        assert len(component) <= 1
+        assert not any(abs(lit) in unknown for clause in component for lit in clause)
+        assert not kb.ask("P0_1")
+        kb.tell("~P1_0")
+        assert kb.ask("P0_1")
+        
+        # Solvers get the component with its variables numbered from 1
+        assert KnowledgeBase.renumber([[7, -40], [40], [-3, 7]]) == [[1, -2], [2], [-3, 1]]
+    
+    def test_tseitin(self):
+        """Test that Tseitin CNF answers like distributed CNF."""
+        kb = KnowledgeBase()
+        tseitin_kb = KnowledgeBase(tseitin=True)
+        sentences = ["(A & B) | (C & D) | (E & F)", "A <=> ( C ^ E )", "~B | ~D"]
+        for sentence in sentences:
+            kb.tell(sentence)
+            tseitin_kb.tell(sentence)
+        
+        for query in ["A", "F", "E | F", "~B", "A ==> ~C"]:
+            assert kb.ask(query) == tseitin_kb.ask(query)
+        
+        tseitin_kb.retract(sentences[0])
+        assert not tseitin_kb.ask("E | F | A")
+        
+        # Distribution doubles the clauses for every conjunction, Tseitin does not
+        logic = kb.logic
+        sentence = " | ".join(f"(A{i} & B{i})" for i in range(8))
+        assert len(logic.conjuncts(logic.to_cnf(sentence))) == 2 ** 8
+        assert len(logic.conjuncts(logic.to_cnf(sentence, tseitin=True))) == 8 * 3 + 1
+    
+    def test_expr(self):
+        """Test that Exprs are interned: equal ones are identical, also after
+        pickling, and unused ones are dropped from the intern table."""
+        a = Expr("|", Expr("Yy1"), ~Expr("Yy2"))
+        b = Expr("|", Expr("Yy1"), Expr("~", Expr("Yy2")))
+        assert a is b and a == b and hash(a) == hash(b) and a != Expr("|", Expr("Yy2"), ~Expr("Yy1"))
+        assert len({a, b, Expr("Yy1") | ~Expr("Yy2")}) == 1
+        assert pickle.loads(pickle.dumps(a)) is a
+        assert pickle.loads(pickle.dumps([a, Expr("Yy1")]))[1] is a.args[0]
+        with pytest.raises(AttributeError):
+            a.op = "&"
+        
+        key = ("|", (Expr("Yy1"), ~Expr("Yy2")))
+        assert key in Expr._interned
+        del a, b, key
+        gc.collect()
+        assert ("Yy1", ()) not in Expr._interned and all("Yy1" not in repr(e) for e in list(Expr._interned.values()))
+
+    
+    def test_parser(self):
+        """Test operator precedence and errors of the sentence parser."""
+        parse = Expr.create_expression
+        assert parse("B0_0 <=> ( P0_1 | P1_0 )") is Expr("<=>", "B0_0", Expr("|", "P0_1", "P1_0"))
+        assert parse("A & B ==> C | ~D") is (Expr("A") & Expr("B")) >> (Expr("C") | ~Expr("D"))
+        assert parse("A ==> B ==> C") is Expr("A") >> (Expr("B") >> Expr("C"))
+        assert parse("F(x, y) =/= G") is Expr("F", "x", "y") ^ Expr("G")
+        
+        for sentence in ["A &", "(A", "A B", "A $ B"]:
+            with pytest.raises(ValueError):
+                parse(sentence)
+
+    
+    def test_rules(self):
+        """Test that the rule template gives the clauses of the parsed rules."""
+        world = Environment(4)
+        parsed_kb, template_kb = KnowledgeBase(), KnowledgeBase()
+        for sentence in Utils().define_starting_clauses(world):
+            parsed_kb.tell(Expr.create_expression(sentence))
+        for clause in WumpusRules(4).clauses():
+            template_kb.tell_clause(clause)
+        assert set(parsed_kb.clauses) == set(template_kb.clauses)
+        assert WumpusRules.compile(4) is WumpusRules.compile(4)
+
+    
+    def test_tell_many(self):
+        """Test that a bulk tell matches one tell per sentence."""
+        sentences = ["A ==> B", "B <=> (C | D)", "A", "~C", "A ==> B"]
+        kb, bulk_kb = KnowledgeBase(), KnowledgeBase()
+        for sentence in sentences:
+            kb.tell(sentence)
+        bulk_kb.tell_many(sentences)
+        assert set(kb.clauses) == set(bulk_kb.clauses)
+        assert len(bulk_kb.clauses) == len(kb.clauses)
+        assert bulk_kb.ask("D") and not bulk_kb.ask("~D")
+        
+        # Clauses given as literals skip conversion and can be mixed with sentences
+        bulk_kb.tell_many([(~Expr("D"), Expr("E")), "E ==> F"])
+        assert bulk_kb.ask("F")
+        assert bulk_kb.ask_many(["F", "C", "G"]) == [True, False, None]
+
+    
+    def test_retract_counts(self):
+        """Test that a clause told twice survives one retract."""
+        kb = KnowledgeBase()
+        kb.tell("B0_0 <=> ( P0_1 | P1_0 )")
+        kb.tell("B0_0 ==> ( P0_1 | P1_0 )")
+        kb.tell("L0_0")
+        kb.tell("L0_0 & ~B0_0")
+        
+        clause = kb.store.encode(Expr.create_expression("~B0_0 | P0_1 | P1_0"))
+        assert kb.store.count(clause) == 2
+        kb.retract("B0_0 <=> ( P0_1 | P1_0 )")
+        assert kb.store.count(clause) == 1
+        assert not kb.ask("~P0_1")
+        
+        kb.retract("L0_0")
+        assert kb.ask("L0_0")
+        kb.retract("L0_0 & ~B0_0")
+        assert not kb.ask("L0_0") and not kb.ask("~B0_0")
+        
+        # Removing a clause that cannot have produced a fact keeps the fact cache
+        kb.tell("~P0_1")
+        kb.tell("P1_0 | P1_1 | W1_1")
+        kb.retract("P1_0 | P1_1 | W1_1")
+        assert not kb.facts._stale and kb.ask("~P0_1")
+        kb.retract("~P0_1")
+        assert not kb.ask("~P0_1")
+
+    
+    def test_snapshot(self, tmp_path, monkeypatch):
+        """Test that a saved KB loads with the same clauses, facts and answers."""
+        kb = KnowledgeBase(tseitin=True)
+        kb.tell_many(WumpusRules(4).clauses())
+        kb.tell_many(["L0_0", "~B0_0", "~S0_0", "B0_1", "(A & B) | (C & D)", "A ==> B"])
+        kb.tell("A ==> B")
+        path = str(tmp_path / "kb.bin")
+        kb.save(path)
+        
+        queries = ["P1_1", "~P0_2", "P1_0", "B | D", "C"]
+        for use_mmap in (True, False):
+            loaded = KnowledgeBase.load(path, use_mmap)
+            assert set(loaded.clauses) == set(kb.clauses)
+            assert loaded.facts.known() == kb.facts.known()
+            assert loaded.ask_many(queries) == kb.ask_many(queries)
+            
+            # Loaded clauses keep their counts and new ones can be added and removed
+            loaded.retract("A ==> B")
+            assert loaded.ask("~A | B")
+            loaded.tell_many(["~B1_1", "~A"])
+            assert loaded.ask("C") and loaded.ask("~P1_2")
+            loaded.retract("~A")
+            assert not loaded.ask("C")
+        
+        # In a fresh process, whose converter may already have given the saved
+        # auxiliary symbols to other subformulas, Tseitin sentences are still retracted
+        first = min(int(name[4:]) for name in kb.store.symbols.names() if name.startswith("Aux_"))
+        monkeypatch.setattr(CNFConverter, "_aux_ids", count(first))
+        monkeypatch.setattr(Logic, "cnf", CNFConverter())
+        KnowledgeBase(tseitin=True).tell("(E & F) | (G & H)")
+        loaded = KnowledgeBase.load(path, tseitin=True)
+        clauses = set(loaded.clauses)
+        loaded.tell("(E & F) | (G & H)")
+        names = [name for name in loaded.store.symbols.names() if name]
+        assert len(names) == len(set(names)) and loaded.ask("E | G")
+        loaded.retract("(E & F) | (G & H)")
+        assert set(loaded.clauses) == clauses
+        
+        assert loaded.ask("A | C")
+        loaded.retract("(A & B) | (C & D)")
+        assert not loaded.ask("A | C")
+        without = KnowledgeBase(tseitin=True)
+        without.tell_many(WumpusRules(4).clauses())
+        without.tell_many(["L0_0", "~B0_0", "~S0_0", "B0_1", "A ==> B", "A ==> B"])
+        assert len(loaded.store) == len(without.store)
+        
+        with open(path, "r+b") as file:
+            file.write(b"XXXX")
+        with pytest.raises(ValueError):
+            KnowledgeBase.load(path)
+
+
 
 if __name__ == "__main__":
     test = TestKnowledgeBase()
@@ -0,0 +1,149 @@
+from typing import List, Optional, Tuple
+import numpy as np
+from logic import Logic
+from stats import STATS
+
+class VectorizedTruthTable:
+    """Truth-table entailment that evaluates a CNF over blocks of 2^k models at
+    once with NumPy.
+
+    Models are bit-packed: each symbol is a column of uint64 words holding its
+    value in 64 consecutive models per word. A clause is evaluated for a whole
+    block by OR-ing the (possibly negated) columns of its literals, and the
+    sentence by AND-ing its clauses. Only the KB clauses connected to the
+    query's symbols are enumerated, which assumes the rest of the KB is
+    consistent. The compiled KB is kept between calls with the same kb, and
+    `entails_clauses` takes clauses already in integer form, such as the ones
+    of a ClauseStore, so that they need no compiling at all.
+    """
+
+    # Values of symbols 0-5 within a 64-model word
+    WORD_PATTERNS = np.array([
+        0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0,
+        0xFF00FF00FF00FF00, 0xFFFF0000FFFF0000, 0xFFFFFFFF00000000,
+    ], dtype=np.uint64)
+    ALL_ONES = np.uint64(0xFFFFFFFFFFFFFFFF)
+
+    def __init__(self, logic: Optional[Logic] = None, max_symbols: int = 30, block_bits: int = 20):
+        self.logic = logic or Logic()
+        self.max_symbols = max_symbols
+        self.block_bits = block_bits
+        self.models_checked = 0
+        self._compiled_kb = None
+
+    def entails(self, kb: "Expr", alpha: "Expr") -> Optional[bool]:
+        """Does kb entail alpha? Returns None if more than `max_symbols` symbols
+        are relevant to the query."""
+        if self._compiled_kb is None or self._compiled_kb[0] is not kb:
+            self._compiled_kb = (kb, self.logic.compile(kb))
+        compiled_kb = self._compiled_kb[1]
+        compiled_alpha = self.logic.compile(alpha, dict(compiled_kb.index))
+
+        # Grow the set of relevant symbols through the clauses that share one.
+        # Clauses holding a symbol and its negation are always true.
+        alpha_clauses = [(pos, neg) for pos, neg in compiled_alpha.clauses if not pos & neg]
+        relevant = 0
+        for pos, neg in alpha_clauses:
+            relevant |= pos | neg
+        remaining = [(pos, neg) for pos, neg in compiled_kb.clauses if not pos & neg]
+        kb_clauses = []
+        changed = True
+        while changed:
+            changed = False
+            rest = []
+            for pos, neg in remaining:
+                if (pos | neg) & relevant:
+                    kb_clauses.append((pos, neg))
+                    if (pos | neg) & ~relevant:
+                        relevant |= pos | neg
+                        changed = True
+                else:
+                    rest.append((pos, neg))
+            remaining = rest
+
+        bits = [i for i in range(relevant.bit_length()) if relevant >> i & 1]
+        if len(bits) > self.max_symbols:
+            return None
+        kb_clauses = [self.literals(clause, bits) for clause in kb_clauses]
+        alpha_clauses = [self.literals(clause, bits) for clause in alpha_clauses]
+        return not self.find_model(kb_clauses, alpha_clauses, len(bits))
+
+    def entails_clauses(self, kb_clauses: List[List[int]], negated_alpha: List[List[int]]) -> Optional[bool]:
+        """Does a KB given as integer clauses entail alpha, given as the integer
+        clauses of ~alpha? The KB clauses are expected to be the ones connected
+        to the query already. Returns None if they hold more than `max_symbols`
+        symbols."""
+        numbers = {}
+        for clause in kb_clauses + negated_alpha:
+            for literal in clause:
+                numbers.setdefault(abs(literal), len(numbers))
+        if len(numbers) > self.max_symbols:
+            return None
+
+        def literals(clause):
+            return [(numbers[abs(literal)], literal < 0) for literal in clause]
+
+        # Any model of KB & ~alpha is a counterexample: the ~alpha clauses join
+        # the KB and alpha becomes the empty clause, false in every model.
+        clauses = [literals(clause) for clause in kb_clauses + negated_alpha]
+        return not self.find_model(clauses, [[]], len(numbers))
+
+    @staticmethod
+    def literals(clause: Tuple[int, int], bits: List[int]) -> List[Tuple[int, bool]]:
+        """Converts a clause's masks into (compact symbol number, negated) pairs."""
+        pos, neg = clause
+        return [(i, bool(neg >> bit & 1)) for i, bit in enumerate(bits) if (pos | neg) >> bit & 1]
+
+    def find_model(self, kb_clauses: list, alpha_clauses: list, n: int) -> bool:
+        """Returns True if some model over n symbols satisfies every kb clause
+        but not every alpha clause."""
+        k = min(n, self.block_bits)
+        words = max(1, 1 << k >> 6)
+        columns = self.block_columns(k, words)
+        if k < 6:
+            valid = np.uint64((1 << (1 << k)) - 1)  # Only the first 2^k bits are models
+        else:
+            valid = self.ALL_ONES
+
+        for block in range(1 << (n - k)):
+            kb_ok = self.evaluate(kb_clauses, columns, k, block, words)
+            if kb_ok is None:
+                continue
+            self.models_checked += 1 << k
+            if STATS.enabled:
+                STATS.count("vtt.models", 1 << k)
+            alpha_ok = self.evaluate(alpha_clauses, columns, k, block, words)
+            counterexamples = kb_ok & valid if alpha_ok is None else kb_ok & ~alpha_ok & valid
+            if counterexamples.any():
+                return True
+        return False
+
+    def block_columns(self, k: int, words: int) -> List[np.ndarray]:
+        """Returns the columns of the k symbols that vary inside a block."""
+        columns = []
+        word_index = np.arange(words, dtype=np.uint64)
+        for i in range(k):
+            if i < 6:
+                columns.append(np.full(words, self.WORD_PATTERNS[i], dtype=np.uint64))
+            else:
+                columns.append(np.where((word_index >> np.uint64(i - 6)) & np.uint64(1), self.ALL_ONES, np.uint64(0)))
+        return columns
+
+    def evaluate(self, clauses: list, columns: List[np.ndarray], k: int, block: int, words: int) -> Optional[np.ndarray]:
+        """Evaluates a CNF over one block. Symbols k and above are constant in the
+        block, their values being the bits of the block number. Returns the
+        packed truth values, or None if the CNF is false in the whole block."""
+        result = np.full(words, self.ALL_ONES, dtype=np.uint64)
+        for clause in clauses:
+            acc = np.zeros(words, dtype=np.uint64)
+            for symbol, negated in clause:
+                if symbol >= k:
+                    if bool(block >> (symbol - k) & 1) != negated:
+                        break  # The literal is true in the whole block
+                    continue
+                acc |= ~columns[symbol] if negated else columns[symbol]
+            else:
+                if not acc.any():
+                    return None
+                result &= acc
+        return result